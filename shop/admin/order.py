@@ -1,11 +1,15 @@
 from django.conf.urls import url
 from django.contrib import admin
 from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import DecimalField, ExpressionWrapper, F
 from django.db.models.fields import Field
 from django.forms import widgets
 from django.http import HttpResponse
 from django.template.loader import select_template
 from django.urls import reverse, NoReverseMatch
+from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.utils.translation import pgettext_lazy
 
@@ -132,6 +136,16 @@ class BaseOrderAdmin(FSMTransitionMixin, admin.ModelAdmin):
             'shop/admin/order-extra.html',
         ])
 
+    def get_queryset(self, request):
+        """
+        Fetch the customers and annotate the outstanding amount, so that rendering the rows of the
+        changelist does not require any further queries.
+        """
+        queryset = super().get_queryset(request).select_related('customer__user')
+        return queryset.annotate(
+            outstanding=ExpressionWrapper(F('_total') - F('_amount_paid'), output_field=DecimalField()),
+        )
+
     def get_number(self, obj):
         return obj.get_number()
     get_number.short_description = pgettext_lazy('admin', "Order number")
@@ -147,11 +161,13 @@ class BaseOrderAdmin(FSMTransitionMixin, admin.ModelAdmin):
     def get_outstanding_amount(self, obj):
         return str(obj.outstanding_amount)
     get_outstanding_amount.short_description = pgettext_lazy('admin', "Outstanding amount")
+    get_outstanding_amount.admin_order_field = 'outstanding'
 
     def is_fully_paid(self, obj):
         return obj.is_fully_paid()
     is_fully_paid.short_description = pgettext_lazy('admin', "Is fully paid")
     is_fully_paid.boolean = True
+    is_fully_paid.admin_order_field = 'outstanding'
 
     def has_add_permission(self, request):
         return False
@@ -165,7 +181,7 @@ class BaseOrderAdmin(FSMTransitionMixin, admin.ModelAdmin):
 
     def get_customer_link(self, obj):
         try:
-            url = reverse('admin:shop_customerproxy_change', args=(obj.customer.pk,))
+            url = reverse('admin:shop_customerproxy_change', args=(obj.customer_id,))
             return format_html('<a href="{0}" target="_new">{1}</a>', url, obj.customer.get_username())
         except NoReverseMatch:
             return format_html('<strong>{0}</strong>', obj.customer.get_username())
@@ -199,6 +215,48 @@ class BaseOrderAdmin(FSMTransitionMixin, admin.ModelAdmin):
         return response
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator which, for an unfiltered changelist, takes the number of rows from the statistics
+    the database keeps about the table, instead of counting them. Those statistics are available
+    on PostgreSQL and MySQL only. Small tables and filtered changelists are counted exactly.
+    """
+    threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, 'query') and not queryset.query.where:
+            estimate = self.estimate_count(queryset)
+            if estimate is not None and estimate > self.threshold:
+                return estimate
+        return super().count
+
+    def estimate_count(self, queryset):
+        connection = connections[queryset.db]
+        db_table = queryset.model._meta.db_table
+        if connection.vendor == 'postgresql':
+            sql = "SELECT reltuples FROM pg_class WHERE relname = %s"
+        elif connection.vendor == 'mysql':
+            sql = "SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s"
+        else:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [db_table])
+            row = cursor.fetchone()
+        if row and row[0] is not None:
+            return int(row[0])
+
+
+class EstimatedCountAdminMixin:
+    """
+    A customized OrderAdmin class shall inherit from this mixin class, to estimate the number
+    of orders in the changelist, rather than counting them. Use it for shops with millions of orders.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 class PrintInvoiceAdminMixin:
     """
     A customized OrderAdmin class shall inherit from this mixin class, to add
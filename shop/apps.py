@@ -11,6 +11,8 @@ class ShopConfig(AppConfig):
     cache_supporting_wildcard = False
 
     def ready(self):
+        from django.db.models.signals import post_save
+        from filer.models import File as FilerFile
         from rest_framework.serializers import ModelSerializer
         from shop.deferred import ForeignKeyBuilder
         from shop.models.fields import JSONField
@@ -26,6 +28,12 @@ class ShopConfig(AppConfig):
 
         cms_tags.register.tags['page_attribute'] = PageAttribute
 
+        # copies of notification attachments are outdated, whenever one of Filer's files changed
+        from shop.models.notification import invalidate_email_attachments
+        for model in self.apps.get_models():
+            if issubclass(model, FilerFile):
+                post_save.connect(invalidate_email_attachments, sender=model)
+
         if callable(getattr(cache, 'delete_pattern', None)):
             self.cache_supporting_wildcard = True
         else:
@@ -38,6 +38,28 @@ class DefaultSettings:
             default_email = None
         return self._setting('SHOP_VENDOR_EMAIL', default_email)
 
+    @property
+    def SHOP_NOTIFICATION_QUEUE(self):
+        """
+        If ``True``, order transitions having notifications are added to a queue, rather than
+        rendering and sending their emails while saving the order. That queue then must be consumed
+        by a separately running worker, invoking ``./manage.py shop notifications`` regularly.
+
+        The default is ``False``, which sends the notifications synchronously.
+        """
+        return self._setting('SHOP_NOTIFICATION_QUEUE', False)
+
+    @property
+    def SHOP_EMAIL_QUEUED_DEBOUNCE(self):
+        """
+        The minimum number of seconds between two announcements of queued emails, published
+        through Redis to the worker sending them. Emails queued in the meantime are announced
+        together, after this interval elapsed.
+
+        The default is ``0``, which announces the emails queued by each transaction on commit.
+        """
+        return self._setting('SHOP_EMAIL_QUEUED_DEBOUNCE', 0)
+
     @property
     def SHOP_MONEY_FORMAT(self):
         """
@@ -190,6 +212,31 @@ class DefaultSettings:
                 "Serializer class must inherit from 'BaseOrderItemSerializer'.")
         return OrderItemSerializer
 
+    @property
+    def SHOP_ORDER_PAGINATION(self):
+        """
+        The pagination class used by the list view of orders. By default it is
+        :class:`shop.views.order.OrderPagination`, which renders links onto numbered pages.
+
+        Shops whose customers have a long history of orders, shall use the keyset pagination
+        :class:`shop.views.order.OrderCursorPagination` instead, which renders links onto the
+        previous and next page only, but neither has to count nor to skip orders.
+
+        This setting replaces the default pagination of ``OrderView`` only. Views declaring another
+        ``pagination_class``, or ``None`` to disable pagination, are not affected.
+        """
+        from django.utils.module_loading import import_string
+
+        return import_string(self._setting('SHOP_ORDER_PAGINATION', 'shop.views.order.OrderPagination'))
+
+    @property
+    def SHOP_ORDER_ARCHIVE_STATUSES(self):
+        """
+        The final states of an order. Only orders in one of these states are moved into the archive
+        by ``./manage.py shop archive-orders``, since they are not expected to change anymore.
+        """
+        return self._setting('SHOP_ORDER_ARCHIVE_STATUSES', ['ready_for_delivery', 'order_canceled'])
+
     @property
     def SHOP_CART_MODIFIERS(self):
         """
@@ -204,6 +251,19 @@ class DefaultSettings:
         cart_modifiers = self._setting('SHOP_CART_MODIFIERS', ['shop.modifiers.defaults.DefaultCartModifier'])
         return [import_string(mc) for mc in cart_modifiers]
 
+    @property
+    def SHOP_CART_MODIFIERS_TIMING(self):
+        """
+        Instrument the :ref:`reference/cart-modifiers`, in order to find out which of them are slow.
+        If set, the wall time and number of database queries spent in each hook method are recorded
+        per modifier and stage. The totals are exposed by the cart's attribute ``modifier_timings``.
+        If set to ``'server-timing'``, the cart views additionally report them using the HTTP header
+        ``Server-Timing``.
+
+        The default is ``False``, so that cart modifiers are invoked without any overhead.
+        """
+        return self._setting('SHOP_CART_MODIFIERS_TIMING', False)
+
     @property
     def SHOP_VALUE_ADDED_TAX(self):
         """
@@ -282,9 +342,31 @@ class DefaultSettings:
         each product.
 
         By default these snippet are cached for one day.
+
+        The computed subtotal, total and extra rows of a cart can be cached across requests, as long
+        as neither the cart's content nor the vary keys of its modifiers change. Since the cached
+        computation does not reflect changed prices or stock levels until it expires, this is
+        disabled by default. Set ``'computed_cart'`` to a number of seconds to enable it.
         """
         result = self._setting('SHOP_CACHE_DURATIONS') or {}
         result.setdefault('product_html_snippet', 86400)
+        result.setdefault('computed_cart', 0)
+        return result
+
+    @property
+    def SHOP_SEQUENCE_BLOCK_SIZES(self):
+        """
+        Order and customer numbers are allocated from sequences, which are incremented atomically.
+        In order to reduce the contention on a sequence, each worker process may allocate a block of
+        numbers at once and hand them out without hitting the database. Then numbers may leave gaps
+        and are not assigned in chronological order anymore.
+
+        By default numbers are allocated one by one. Blocks are never allocated inside a database
+        transaction, since its rollback would revert the whole block.
+        """
+        result = self._setting('SHOP_SEQUENCE_BLOCK_SIZES') or {}
+        result.setdefault('order_number', 1)
+        result.setdefault('customer_number', 1)
         return result
 
     @property
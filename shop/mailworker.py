@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils.timezone import now, timedelta
+from post_office.connections import connections
+from post_office.models import Email, Log, STATUS
+from post_office.settings import get_batch_size, get_log_level, get_sending_order, get_threads_per_process
+from shop.signals import redis_con as default_redis_con
+
+logger = logging.getLogger('shop.mailworker')
+
+
+class MailWorker:
+    """
+    Consumer for the emails handed over to the Post-Office, as announced by
+    :func:`shop.signals.email_queued`.
+
+    If Redis is configured, the worker subscribes to the channel ``django-SHOP``. Each publish
+    event wakes it up, then it waits for ``coalesce_delay`` seconds, so that a burst of events
+    results in one single drain of the mail queue. Independently of Redis, the queue is drained
+    every ``poll_interval`` seconds, in order to send scheduled emails and those queued while the
+    worker was not listening.
+
+    While draining, each batch of emails is claimed by a short transaction, which leases its rows
+    for ``claim_timeout`` seconds. The emails are then rendered by the worker's thread, and sent
+    outside of any transaction by a pool of at most ``threads`` threads. Each of them sends its
+    share of the batch through its own connection to the mail server, which is closed after the
+    batch has been sent.
+    """
+    channel = 'django-SHOP'
+
+    def __init__(self, redis_con=default_redis_con, poll_interval=5.0, coalesce_delay=0.5, threads=None,
+                 claim_timeout=300.0):
+        self.redis_con = redis_con
+        self.poll_interval = poll_interval
+        self.coalesce_delay = coalesce_delay
+        self.threads = threads or get_threads_per_process()
+        self.claim_timeout = claim_timeout
+        self.pubsub = None
+
+    def subscribe(self):
+        if self.pubsub is None and hasattr(self.redis_con, 'pubsub'):
+            self.pubsub = self.redis_con.pubsub(ignore_subscribe_messages=True)
+            self.pubsub.subscribe(self.channel)
+        return self.pubsub
+
+    def wait(self):
+        """
+        Block until emails have been announced or the poll interval elapsed. Announcements
+        arriving during the coalesce delay are consumed and handled by the same drain.
+
+        :returns: The number of consumed announcements.
+        """
+        pubsub = self.subscribe()
+        if pubsub is None:
+            time.sleep(self.poll_interval)
+            return 0
+        if pubsub.get_message(timeout=self.poll_interval) is None:
+            return 0
+        num_events = 1
+        time.sleep(self.coalesce_delay)
+        while pubsub.get_message(timeout=0) is not None:
+            num_events += 1
+        return num_events
+
+    def run(self, max_drains=None):
+        """
+        Drain the mail queue, whenever emails have been announced or the poll interval elapsed.
+        Runs forever, unless ``max_drains`` is given.
+        """
+        num_drains = 0
+        while max_drains is None or num_drains < max_drains:
+            num_events = self.wait()
+            num_sent, num_failed = self.drain()
+            if num_sent or num_failed:
+                logger.info("Sent %d emails, %d failed, after %d announcements.", num_sent, num_failed, num_events)
+            num_drains += 1
+
+    def drain(self):
+        """
+        Send all queued emails, batch by batch, until the queue is empty.
+
+        :returns: A tuple with the number of sent and failed emails.
+        """
+        num_sent = num_failed = 0
+        while True:
+            claimed = self.claim_batch()
+            if not claimed:
+                break
+            emails = Email.objects.filter(pk__in=claimed.keys()).order_by(*get_sending_order())
+            emails = list(emails.prefetch_related('template', 'attachments'))
+            for email in emails:
+                email.scheduled_time = claimed[email.pk]
+            sent, failed = self.send_batch(emails)
+            num_sent += sent
+            num_failed += failed
+        return num_sent, num_failed
+
+    def claim_batch(self):
+        """
+        Claim a batch of queued emails due for sending. Within a short transaction, their scheduled
+        time is postponed by ``claim_timeout`` seconds, so that neither other workers nor the
+        Post-Office pick them up while they are sent. Should this worker terminate meanwhile, its
+        claimed emails become due again, after their lease expired.
+
+        :returns: A dict mapping the primary keys of the claimed emails onto their scheduled time.
+        """
+        with transaction.atomic():
+            # other workers skip the locked emails rather than claiming them twice
+            queued = Email.objects.filter(status=STATUS.queued)
+            queued = queued.filter(Q(scheduled_time__lte=now()) | Q(scheduled_time__isnull=True))
+            queued = queued.order_by(*get_sending_order()).select_for_update(skip_locked=True)
+            claimed = dict(queued.values_list('pk', 'scheduled_time')[:get_batch_size()])
+            if claimed:
+                leased_until = now() + timedelta(seconds=self.claim_timeout)
+                Email.objects.filter(pk__in=claimed.keys()).update(scheduled_time=leased_until)
+        return claimed
+
+    def send_batch(self, emails):
+        log_level = get_log_level()
+        sendable, failed = [], []
+        for email in emails:
+            # render the messages upfront, so that the sending threads do not access the database
+            try:
+                email.prepare_email_message()
+            except Exception as exc:
+                failed.append((email, exc))
+            else:
+                sendable.append(email)
+
+        # the prepared messages refer to the connection of this thread, which is not used for sending
+        connections.close()
+        if sendable:
+            num_threads = min(self.threads, len(sendable))
+            pool = [threading.Thread(target=self.send_share, args=(sendable[k::num_threads], failed))
+                    for k in range(num_threads)]
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+
+        failed_ids = {email.pk for email, exc in failed}
+        sent = [email for email in sendable if email.pk not in failed_ids]
+        logs = []
+        if log_level >= 1:
+            logs.extend(Log(email=email, status=STATUS.failed, message=str(exc),
+                            exception_type=type(exc).__name__) for email, exc in failed)
+        if log_level >= 2:
+            logs.extend(Log(email=email, status=STATUS.sent) for email in sent)
+        with transaction.atomic():
+            self.release(sent, STATUS.sent)
+            self.release([email for email, exc in failed], STATUS.failed)
+            Log.objects.bulk_create(logs)
+        return len(sent), len(failed)
+
+    def release(self, emails, status):
+        """
+        Write the final status of the given claimed emails and restore their scheduled time.
+        """
+        if emails:
+            scheduled_times = [models.When(pk=email.pk, then=models.Value(email.scheduled_time))
+                               for email in emails]
+            Email.objects.filter(pk__in=[email.pk for email in emails]).update(
+                status=status,
+                scheduled_time=models.Case(*scheduled_times, output_field=models.DateTimeField()),
+            )
+
+    def send_share(self, emails, failed):
+        """
+        Send the given emails from within a thread of the pool. The Post-Office keeps one
+        connection per thread and backend, which is reused for all of these emails.
+        """
+        try:
+            for email in emails:
+                try:
+                    message = email.email_message()
+                    message.connection = connections[email.backend_alias or 'default']
+                    message.send()
+                except Exception as exc:
+                    failed.append((email, exc))
+        finally:
+            connections.close()
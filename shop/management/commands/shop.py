@@ -1,6 +1,12 @@
+import csv
+import json
+from itertools import islice
+
 from cms.models.static_placeholder import StaticPlaceholder
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.module_loading import import_string
 from cmsplugin_cascade.models import CascadeClipboard
 from shop.management.utils import deserialize_to_placeholder
@@ -31,7 +37,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             'subcommand',
-            help="./manage.py shop [customers|check-pages|review-settings]",
+            help="./manage.py shop [customers|check-pages|review-settings|recount-carts|recount-orders|export-orders|archive-orders|rebuild-rollups|notifications|mailworker]",
         )
         parser.add_argument(
             '--delete-expired',
@@ -53,6 +59,58 @@ class Command(BaseCommand):
             default=False,
             help="Use in combination with 'check-pages' to add missing recommended pages.",
         )
+        parser.add_argument(
+            '--since',
+            dest='since',
+            help="Use in combination with 'export-orders' to export orders created since this date or datetime.",
+        )
+        parser.add_argument(
+            '--status',
+            action='append',
+            dest='status',
+            help="Use in combination with 'export-orders' or 'archive-orders' to select orders in this status. "
+                 "May be repeated.",
+        )
+        parser.add_argument(
+            '--before',
+            dest='before',
+            help="Use in combination with 'archive-orders' to archive orders created before this date or datetime.",
+        )
+        parser.add_argument(
+            '--format',
+            choices=['jsonl', 'csv'],
+            default='jsonl',
+            dest='format',
+            help="Use in combination with 'export-orders' to choose the output format.",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            dest='chunk_size',
+            help="Use in combination with 'export-orders', 'archive-orders' or 'notifications' for the number of "
+                 "orders fetched at once.",
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            dest='poll_interval',
+            help="Use in combination with 'mailworker' for the number of seconds between polling the mail queue.",
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            dest='threads',
+            help="Use in combination with 'mailworker' for the maximum number of threads sending emails.",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            dest='once',
+            default=False,
+            help="Use in combination with 'mailworker' to drain the mail queue once and exit.",
+        )
 
     def handle(self, verbosity, subcommand, *args, **options):
         if subcommand == 'help':
@@ -70,6 +128,35 @@ Usage:
 
 ./manage.py shop review-settings
     Review all shop related settings and complain about missing- or mis-configurations.
+
+./manage.py shop recount-carts
+    Recompute the number of items and the total quantity stored on each cart.
+
+./manage.py shop recount-orders
+    Recompute the amount paid and the unfulfilled quantity stored on each order.
+
+./manage.py shop export-orders
+    Stream all orders with their items, payments and extra rows to stdout, one JSON object per line.
+    Use option --format=csv to write comma separated values instead, with nested values JSON encoded.
+    Use options --since=<date> and --status=<status> to restrict the exported orders.
+
+./manage.py shop archive-orders --before=<date>
+    Move orders created before the given date and in a final state into compressed snapshots.
+    Use option --status=<status> to archive orders in that state, rather than those configured
+    in settings.SHOP_ORDER_ARCHIVE_STATUSES.
+
+./manage.py shop rebuild-rollups
+    Recompute the daily revenues, the daily product sales and the number of orders per status.
+
+./manage.py shop notifications
+    Send the notifications of all order transitions queued while settings.SHOP_NOTIFICATION_QUEUE
+    is set. Use option --chunk-size=<n> for the number of transitions sent per batch.
+
+./manage.py shop mailworker
+    Send the emails queued by the Post-Office, whenever they are announced through Redis, or
+    otherwise every few seconds, as given by option --poll-interval=<seconds>.
+    Use option --threads=<n> for the maximum number of threads sending emails.
+    Use option --once to drain the mail queue once and exit.
 """)
         elif subcommand == 'customers':
             self.delete_expired = options['delete_expired']
@@ -88,8 +175,22 @@ Usage:
             self.stdout.write("The following configuration settings must be fixed:")
             for k, msg in enumerate(self.review_settings(), 1):
                 self.stdout.write(" {}. {}".format(k, msg))
+        elif subcommand == 'recount-carts':
+            self.recount_carts()
+        elif subcommand == 'recount-orders':
+            self.recount_orders()
+        elif subcommand == 'export-orders':
+            self.export_orders(options['since'], options['status'], options['format'], options['chunk_size'])
+        elif subcommand == 'archive-orders':
+            self.archive_orders(options['before'], options['status'], options['chunk_size'])
+        elif subcommand == 'rebuild-rollups':
+            self.rebuild_rollups()
+        elif subcommand == 'notifications':
+            self.notifications(options['chunk_size'])
+        elif subcommand == 'mailworker':
+            self.mailworker(options['poll_interval'], options['threads'], options['once'])
         else:
-            msg = "Unknown sub-command for shop. Use one of: customer check-pages review-settings"
+            msg = "Unknown sub-command for shop. Use one of: customer check-pages review-settings recount-carts recount-orders export-orders archive-orders rebuild-rollups notifications mailworker"
             self.stderr.write(msg.format(subcommand))
 
     def customers(self):
@@ -118,6 +219,122 @@ Usage:
         msg = "Customers in this shop: total={total}, anonymous={anonymous}, expired={expired}, active={active}, guests={guests}, registered={registered}, staff={staff}."
         self.stdout.write(msg.format(**data))
 
+    def recount_carts(self):
+        """
+        Entry point for subcommand ``./manage.py shop recount-carts``.
+        """
+        from shop.models.cart import CartModel
+
+        num_carts = CartModel.objects.recount_items()
+        self.stdout.write("Recounted the items of {} carts.".format(num_carts))
+
+    def recount_orders(self):
+        """
+        Entry point for subcommand ``./manage.py shop recount-orders``.
+        """
+        from shop.models.order import OrderModel
+
+        num_orders = OrderModel.objects.update_summaries()
+        self.stdout.write("Recomputed the summaries of {} orders.".format(num_orders))
+
+    def export_orders(self, since=None, status=None, format='jsonl', chunk_size=500):
+        """
+        Entry point for subcommand ``./manage.py shop export-orders``.
+
+        The primary keys of the selected orders are read through a server-side cursor, while the
+        orders themselves are fetched and prefetched chunk by chunk, so that the memory used does
+        not depend on the number of exported orders.
+        """
+        from shop.models.order import OrderModel
+        from shop.rest.money import JSONEncoder
+        from shop.serializers.order import OrderExportSerializer
+
+        queryset = OrderModel.objects.all()
+        if since:
+            queryset = queryset.filter(created_at__gte=self.parse_datetime('since', since))
+        if status:
+            queryset = queryset.filter(status__in=status)
+        pks = queryset.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+        writer = None
+        for chunk in iter(lambda: list(islice(pks, chunk_size)), []):
+            orders = OrderExportSerializer.prepare_queryset(OrderModel.objects.filter(pk__in=chunk).order_by('pk'))
+            for order in orders:
+                data = OrderExportSerializer(order, context={'render_label': 'export'}).data
+                if format == 'csv':
+                    if writer is None:
+                        writer = csv.DictWriter(self.stdout, fieldnames=list(data.keys()), lineterminator='\n')
+                        writer.writeheader()
+                    writer.writerow({key: json.dumps(value, cls=JSONEncoder) if isinstance(value, (dict, list)) else value
+                                     for key, value in data.items()})
+                else:
+                    self.stdout.write(json.dumps(data, cls=JSONEncoder))
+
+    def archive_orders(self, before, status=None, chunk_size=500):
+        """
+        Entry point for subcommand ``./manage.py shop archive-orders``.
+        """
+        from shop.conf import app_settings
+        from shop.models.order import ArchivedOrder, OrderModel
+
+        if not before:
+            raise CommandError("Subcommand 'archive-orders' requires option --before.")
+        queryset = OrderModel.objects.filter(
+            created_at__lt=self.parse_datetime('before', before),
+            status__in=status or app_settings.ORDER_ARCHIVE_STATUSES,
+        )
+        num_orders = 0
+        pks = list(queryset.order_by('pk').values_list('pk', flat=True))
+        for offset in range(0, len(pks), chunk_size):
+            for order in OrderModel.objects.filter(pk__in=pks[offset:offset + chunk_size]).order_by('pk'):
+                ArchivedOrder.objects.archive(order)
+                num_orders += 1
+        self.stdout.write("Archived {} orders.".format(num_orders))
+
+    def rebuild_rollups(self):
+        """
+        Entry point for subcommand ``./manage.py shop rebuild-rollups``.
+        """
+        from shop.models.rollup import rebuild_rollups
+
+        rebuild_rollups()
+        self.stdout.write("Rebuilt the sales rollups.")
+
+    def notifications(self, chunk_size=100):
+        """
+        Entry point for subcommand ``./manage.py shop notifications``.
+        """
+        from shop.transition import dispatch_queued_notifications
+
+        num_dispatched = dispatch_queued_notifications(chunk_size)
+        self.stdout.write("Sent the notifications of {} order transitions.".format(num_dispatched))
+
+    def mailworker(self, poll_interval=5.0, threads=None, once=False):
+        """
+        Entry point for subcommand ``./manage.py shop mailworker``.
+        """
+        from shop.mailworker import MailWorker
+
+        worker = MailWorker(poll_interval=poll_interval, threads=threads)
+        if once:
+            num_sent, num_failed = worker.drain()
+            self.stdout.write("Sent {} emails, {} failed.".format(num_sent, num_failed))
+        else:
+            self.stdout.write("Waiting for emails to be sent, press Ctrl-C to quit.")
+            try:
+                worker.run()
+            except KeyboardInterrupt:
+                pass
+
+    def parse_datetime(self, option, value):
+        result = parse_datetime(value) or parse_date(value)
+        if result is None:
+            raise CommandError("Option --{} requires a date or datetime, got '{}'.".format(option, value))
+        if not hasattr(result, 'hour'):
+            result = timezone.datetime.combine(result, timezone.datetime.min.time())
+        if timezone.is_naive(result):
+            result = timezone.make_aware(result)
+        return result
+
     def create_recommended_pages(self):
         from cms.models.pagemodel import Page
         from cms.utils.i18n import get_public_languages
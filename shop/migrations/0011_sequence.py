@@ -0,0 +1,25 @@
+# Generated by Django 3.0.14 on 2026-10-18 05:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_auto_20191224_0727'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Name')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Last allocated value')),
+            ],
+            options={
+                'verbose_name': 'Sequence',
+                'verbose_name_plural': 'Sequences',
+            },
+        ),
+    ]
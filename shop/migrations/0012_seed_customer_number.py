@@ -0,0 +1,32 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db import migrations, models
+
+
+def seed_customer_number(apps, schema_editor):
+    """
+    Seed the sequence of customer numbers from the highest number assigned so far, if the
+    materialized customer model has a field ``number``.
+    """
+    from shop.models.customer import CustomerModel
+
+    try:
+        Customer = apps.get_model(CustomerModel._meta.app_label, CustomerModel._meta.model_name)
+        Customer._meta.get_field('number')
+    except (LookupError, FieldDoesNotExist):
+        # the customer model has no number or has not been migrated yet; the sequence then is
+        # seeded on first use
+        return
+    Sequence = apps.get_model('shop', 'Sequence')
+    max_number = Customer.objects.aggregate(models.Max('number'))['number__max'] or 0
+    Sequence.objects.update_or_create(name='customer_number', defaults={'value': max_number})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0011_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_customer_number, reverse_code=migrations.RunPython.noop),
+    ]
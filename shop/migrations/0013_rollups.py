@@ -0,0 +1,55 @@
+# Generated by Django 3.0.14 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0012_seed_customer_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatusCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=50, unique=True, verbose_name='Status')),
+                ('count', models.IntegerField(default=0, verbose_name='Number of orders')),
+            ],
+            options={
+                'verbose_name': 'Order status count',
+                'verbose_name_plural': 'Order status counts',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('currency', models.CharField(max_length=7, verbose_name='Currency')),
+                ('num_orders', models.PositiveIntegerField(default=0, verbose_name='Number of orders')),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='Subtotal')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=30, verbose_name='Total')),
+            ],
+            options={
+                'verbose_name': 'Daily revenue',
+                'verbose_name_plural': 'Daily revenues',
+                'unique_together': {('date', 'currency')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyProductSales',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('product_code', models.CharField(max_length=255, verbose_name='Product code')),
+                ('quantity', models.DecimalField(decimal_places=3, default=0, max_digits=30, verbose_name='Quantity')),
+            ],
+            options={
+                'verbose_name': 'Daily product sales',
+                'verbose_name_plural': 'Daily product sales',
+                'unique_together': {('date', 'product_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.14 on 2026-10-18 05:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0013_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedNotification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.BigIntegerField(verbose_name='Order ID')),
+                ('transition_target', models.CharField(max_length=50, verbose_name='Event')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+            ],
+            options={
+                'verbose_name': 'Queued notification',
+                'verbose_name_plural': 'Queued notifications',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.0.14 on 2026-10-18 05:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post_office', '0008_attachment_headers'),
+        ('shop', '0014_queuednotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationattachment',
+            name='email_attachment',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='post_office.Attachment'),
+        ),
+    ]
@@ -1 +1,3 @@
-from shop.models.notification import Notification, NotificationAttachment
+from shop.models.notification import Notification, NotificationAttachment, QueuedNotification
+from shop.models.sequence import Sequence
+from shop.models.rollup import DailyProductSales, DailyRevenue, OrderStatusCount
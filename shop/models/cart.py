@@ -1,15 +1,22 @@
 import warnings
 from collections import OrderedDict
+from decimal import Decimal
 
 from django.core import checks
-from django.db import models
-from django.utils.translation import gettext_lazy as _
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.aggregates import Count, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.translation import get_language, gettext_lazy as _
 
 from shop import deferred
+from shop.conf import app_settings
 from shop.models.fields import JSONField
 from shop.models.customer import CustomerModel
 from shop.models.product import BaseProduct
 from shop.modifiers.pool import cart_modifiers_pool
+from shop.modifiers.timing import get_timings
 from shop.money import Money
 
 
@@ -22,6 +29,11 @@ class CartItemManager(models.Manager):
         """
         Create a unique cart item. If the same product exists already in the given cart,
         increase its quantity, if the product in the cart seems to be the same.
+
+        This is safe against concurrent requests adding to the same cart: The cart's row is locked
+        while looking up the item, and the quantity of an existing item is increased using an
+        ``F()`` expression, rather than writing back a previously read value. The cart's version
+        and item counters are bumped exactly once.
         """
         cart = kwargs.pop('cart')
         product = kwargs.pop('product')
@@ -29,35 +41,154 @@ class CartItemManager(models.Manager):
 
         # add a new item to the cart, or reuse an existing one, increasing the quantity
         watched = not quantity
-        cart_item = product.is_in_cart(cart, watched=watched, **kwargs)
-        if cart_item:
-            if not watched:
-                cart_item.quantity += quantity
-            created = False
-        else:
-            cart_item = self.model(cart=cart, product=product, quantity=quantity, **kwargs)
-            created = True
-
-        cart_item.save()
+        with transaction.atomic():
+            list(CartModel.objects.select_for_update().filter(pk=cart.pk).values_list('pk'))
+            cart_item = product.is_in_cart(cart, watched=watched, **kwargs)
+            if cart_item:
+                cart_item.cart = cart
+                if not watched:
+                    cart_item.quantity += quantity
+                    cart_item.updated_at = timezone.now()
+                    self.filter(pk=cart_item.pk).update(
+                        quantity=models.F('quantity') + quantity,
+                        updated_at=cart_item.updated_at,
+                    )
+                    cart_item.touch_cart(cart_item.quantity)
+                    cart_item._dirty = True
+                created = False
+            else:
+                cart_item = self.model(cart=cart, product=product, quantity=quantity, **kwargs)
+                cart_item.save()
+                created = True
         return cart_item, created
 
+    def add_items(self, cart, items):
+        """
+        Add many items to the given cart, each one as :meth:`get_or_create` does. The cart's row is
+        locked only once, and its version and item counters are bumped only once, by the summed up
+        differences of all added items.
+
+        :param items: A list of dicts, each containing the keyword arguments for :meth:`get_or_create`.
+
+        :returns: The list of created or updated cart items.
+        """
+        cart_items = []
+        num_items, total_quantity = 0, 0
+        with transaction.atomic():
+            list(CartModel.objects.select_for_update().filter(pk=cart.pk).values_list('pk'))
+            for kwargs in items:
+                kwargs = dict(kwargs)
+                kwargs.pop('cart', None)
+                product = kwargs.pop('product')
+                quantity = int(kwargs.pop('quantity', 1))
+                watched = not quantity
+                cart_item = product.is_in_cart(cart, watched=watched, **kwargs)
+                if cart_item:
+                    cart_item.cart = cart
+                    if not watched:
+                        num_items += int(cart_item.quantity == 0)
+                        cart_item.quantity += quantity
+                        cart_item.updated_at = timezone.now()
+                        self.filter(pk=cart_item.pk).update(
+                            quantity=models.F('quantity') + quantity,
+                            updated_at=cart_item.updated_at,
+                        )
+                elif self.model.save is BaseCartItem.save:
+                    num_items += int(quantity > 0)
+                    cart_item = self.model(cart=cart, product=product, quantity=quantity, **kwargs)
+                    # insert the item without touching the cart, this is done once for all items
+                    cart_item.save_base()
+                else:
+                    # the materialized cart item customizes its save method, which touches the cart
+                    cart_item = self.model(cart=cart, product=product, quantity=quantity, **kwargs)
+                    cart_item.save()
+                    cart_items.append(cart_item)
+                    continue
+                total_quantity += quantity
+                cart_item._saved_quantity = cart_item.quantity
+                cart_item._dirty = True
+                cart_items.append(cart_item)
+            cart.touch(num_items=num_items, total_quantity=total_quantity)
+        return cart_items
+
     def filter_cart_items(self, cart, request):
         """
         Use this method to fetch items for shopping from the cart. It rearranges the result set
         according to the defined modifiers.
         """
         cart_items = self.filter(cart=cart, quantity__gt=0).order_by('updated_at')
-        for modifier in cart_modifiers_pool.get_all_modifiers():
+        for modifier in cart_modifiers_pool.get_execution_plan()['arrange_cart_items']:
             cart_items = modifier.arrange_cart_items(cart_items, request)
         return cart_items
 
+    def refresh_cart_items(self, cart, cart_items, request):
+        """
+        Use this method to refresh items previously fetched by ``filter_cart_items()``, in case
+        their rows changed in the database meanwhile. The version of each item, ie. the timestamp of
+        its latest modification, is compared against the database using one query, so that only
+        the rows which really changed under us are reloaded.
+        """
+        versions = dict(self.filter(cart=cart, quantity__gt=0).values_list('pk', 'updated_at'))
+        if set(versions.keys()) != set(item.pk for item in cart_items):
+            # items were added or removed meanwhile
+            return self.filter_cart_items(cart, request)
+        for item in cart_items:
+            if item.updated_at != versions[item.pk]:
+                item.refresh_from_db()
+                item._dirty = True
+        return cart_items
+
+    def prefetch_products(self, cart_items):
+        """
+        Load the products referred by the given cart items polymorphically in one pass.
+        """
+        product_field = self.model._meta.get_field('product')
+        product_ids = set(item.product_id for item in cart_items if not product_field.is_cached(item))
+        if product_ids:
+            products = product_field.related_model.objects.in_bulk(product_ids)
+            for item in cart_items:
+                if item.product_id in products:
+                    item.product = products[item.product_id]
+
+    def prefetch_cart_items(self, cart_items, request):
+        """
+        Load the products referred by the given cart items polymorphically in one pass and resolve
+        their availability in bulk. This prevents the cart modifiers from querying the products and
+        their inventories item by item.
+        """
+        self.prefetch_products(cart_items)
+        products_by_class = {}
+        for item in cart_items:
+            products_by_class.setdefault(item.product.__class__, {})[item.product.pk] = item.product
+        availabilities = {}
+        for product_class, products in products_by_class.items():
+            if self.supports_bulk_availability(product_class):
+                availabilities.update(product_class.get_availabilities(list(products.values()), request))
+        for item in cart_items:
+            item._availability = availabilities.get(item.product_id)
+
+    @staticmethod
+    def supports_bulk_availability(product_class):
+        """
+        Returns ``True``, if ``get_availabilities()`` of the given product class is implemented at
+        least as specifically as its ``get_availability()``. Otherwise a product class overriding
+        ``get_availability()``, while inheriting the bulk hook from a mixin, would silently lose
+        its own implementation.
+        """
+        def defining_class_index(name):
+            for index, klass in enumerate(product_class.__mro__):
+                if name in klass.__dict__:
+                    return index
+
+        return defining_class_index('get_availabilities') <= defining_class_index('get_availability')
+
     def filter_watch_items(self, cart, request):
         """
         Use this method to fetch items from the watch list. It rearranges the result set
         according to the defined modifiers.
         """
         watch_items = self.filter(cart=cart, quantity=0)
-        for modifier in cart_modifiers_pool.get_all_modifiers():
+        for modifier in cart_modifiers_pool.get_execution_plan()['arrange_watch_items']:
             watch_items = modifier.arrange_watch_items(watch_items, request)
         return watch_items
 
@@ -122,13 +253,95 @@ class BaseCartItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
         model_kwargs = {k: v for k, v in kwargs.items() if k in all_field_names}
         super().__init__(*args, **model_kwargs)
         self.extra_rows = OrderedDict()
+        self._availability = None
+        self._saved_quantity = 0
         self._dirty = True
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        cart_item = super().from_db(db, field_names, values)
+        # remember the stored quantity, to adjust the cart's counters by the difference on saving
+        cart_item._saved_quantity = cart_item.__dict__.get('quantity')
+        return cart_item
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using=using, fields=fields)
+        if fields is None or 'quantity' in fields:
+            self._saved_quantity = self.quantity
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.cart.save(update_fields=['updated_at'])
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.touch_cart(self.quantity)
         self._dirty = True
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.touch_cart(0)
+        return result
+
+    def touch_cart(self, quantity):
+        """
+        Bump the version of the cart this item belongs to and adjust its item counters by the
+        difference between the given and the stored quantity.
+        """
+        if self._saved_quantity is None:
+            # the stored quantity is unknown, hence recount all items of this cart
+            CartModel.objects.recount_items(pk=self.cart_id)
+            self.cart.refresh_from_db(fields=['_num_items', '_total_quantity'])
+            self.cart.touch()
+        else:
+            num_items = int(quantity > 0) - int(self._saved_quantity > 0)
+            self.cart.touch(num_items=num_items, total_quantity=quantity - self._saved_quantity)
+        self._saved_quantity = quantity
+
+    def get_merge_key(self):
+        """
+        Returns the key used to decide whether two cart items shall be merged into one.
+        """
+        return self.product_id, self.product.get_cart_item_key(product_code=self.product_code, extra=self.extra)
+
+    def get_availability(self, request):
+        """
+        Returns the availability of the product referred by this cart item. If it has been
+        prefetched by :meth:`CartItemManager.prefetch_cart_items`, no further query is required.
+        """
+        if self._availability is not None:
+            return self._availability
+        kwargs = {'product_code': self.product_code}
+        kwargs.update(self.extra)
+        return self.product.get_availability(request, **kwargs)
+
+    def get_cache_key(self, vary_key):
+        """
+        Returns the key used to cache the computation of this item. It depends on the version of
+        this item, which is the timestamp of its latest modification.
+        """
+        return 'cart_item:{0}|{1}-{2}'.format(self.pk, self.updated_at.isoformat(), vary_key)
+
+    def get_computed_state(self):
+        """
+        Returns the unit price, line total and extra rows, as computed by the cart modifiers.
+        """
+        return {
+            'unit_price': self.unit_price,
+            'line_total': self.line_total,
+            'extra_rows': [(modifier, extra_row.instance) for modifier, extra_row in self.extra_rows.items()],
+        }
+
+    def set_computed_state(self, computed):
+        """
+        Restore the unit price, line total and extra rows, as returned by ``get_computed_state()``.
+        """
+        from shop.serializers.cart import ExtraCartRow
+
+        self.unit_price = computed['unit_price']
+        self.line_total = computed['line_total']
+        self.extra_rows = OrderedDict((modifier, ExtraCartRow(instance))
+                                      for modifier, instance in computed['extra_rows'])
+        self._dirty = False
+
     def update(self, request):
         """
         Loop over all registered cart modifier, change the price per cart item and optionally add
@@ -136,9 +349,8 @@ class BaseCartItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
         """
         if not self._dirty:
             return
-        self.refresh_from_db()
         self.extra_rows = OrderedDict()  # reset the dictionary
-        for modifier in cart_modifiers_pool.get_all_modifiers():
+        for modifier in cart_modifiers_pool.get_execution_plan()['process_cart_item']:
             modifier.process_cart_item(self, request)
         self._dirty = False
 
@@ -169,6 +381,21 @@ class CartManager(models.Manager):
             request._cached_cart, created = self.get_or_create(customer=request.customer)
         return request._cached_cart
 
+    def recount_items(self, **filters):
+        """
+        Recompute the denormalized item counters from the cart items, for all carts or just for
+        those matching the given filters, using one query.
+
+        :returns: The number of recounted carts.
+        """
+        cart_items = CartItemModel.objects.filter(cart=models.OuterRef('pk')).order_by().values('cart')
+        num_items = cart_items.filter(quantity__gt=0).annotate(num_items=Count('pk')).values('num_items')
+        total_quantity = cart_items.annotate(total_quantity=Sum('quantity')).values('total_quantity')
+        return self.filter(**filters).update(
+            _num_items=Coalesce(models.Subquery(num_items), 0),
+            _total_quantity=Coalesce(models.Subquery(total_quantity), 0),
+        )
+
 
 class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
     """
@@ -193,9 +420,26 @@ class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
 
     extra = JSONField(verbose_name=_("Arbitrary information for this cart"))
 
+    # denormalized counters, maintained by the cart items
+    _num_items = models.PositiveIntegerField(
+        _("Number of items"),
+        default=0,
+        editable=False,
+    )
+
+    _total_quantity = models.DecimalField(
+        _("Total quantity"),
+        max_digits=30,
+        decimal_places=3,
+        default=0,
+        editable=False,
+    )
+
     # our CartManager determines the cart object from the request.
     objects = CartManager()
 
+    counter_fields = ['_num_items', '_total_quantity']
+
     class Meta:
         abstract = True
         verbose_name = _("Shopping Cart")
@@ -205,15 +449,37 @@ class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
         super().__init__(*args, **kwargs)
         # That will hold things like tax totals or total discount
         self.extra_rows = OrderedDict()
+        # the time and queries spent by each cart modifier, if instrumented
+        self.modifier_timings = OrderedDict()
         self._cached_cart_items = None
         self._dirty = True
 
     def save(self, force_update=False, *args, **kwargs):
+        if self.pk and not self._state.adding and not args and 'update_fields' not in kwargs:
+            # the item counters are maintained by the cart items, never overwrite them
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name not in self.counter_fields]
         if self.pk or force_update is False:
             super().save(force_update=force_update, *args, **kwargs)
         self._dirty = True
 
-    def update(self, request, raise_exception=False):
+    def touch(self, num_items=0, total_quantity=0):
+        """
+        Bump the version of this cart and adjust its item counters by the given differences,
+        using one atomic query.
+        """
+        total_quantity = Decimal(str(total_quantity))
+        self.updated_at = timezone.now()
+        type(self).objects.filter(pk=self.pk).update(
+            updated_at=self.updated_at,
+            _num_items=models.F('_num_items') + num_items,
+            _total_quantity=models.F('_total_quantity') + total_quantity,
+        )
+        self._num_items += num_items
+        self._total_quantity += total_quantity
+        self._dirty = True
+
+    def update(self, request, raise_exception=False, use_cache=True):
         """
         This should be called after a cart item changed quantity, has been added or removed.
 
@@ -221,6 +487,10 @@ class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
         After this is done, it will compute and update the order's total and subtotal fields, along
         with any supplement added along the way by modifiers.
 
+        If ``use_cache`` is ``False``, the cart is computed from scratch, neither restoring nor storing
+        a cached computation of the cart or of its items. The checkout sets it, since cached totals
+        may not reflect the current prices.
+
         Note that theses added fields are not stored - we actually want to
         reflect rebate and tax changes on the *cart* items, but we don't want
         that for the order items (since they are legally binding after the
@@ -229,17 +499,48 @@ class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
         if not self._dirty:
             return
 
+        # Only modifiers actually overriding a hook method are invoked, as compiled by the plan.
+        plan = cart_modifiers_pool.get_execution_plan()
+        if plan.instrumented:
+            self.modifier_timings = get_timings(request)
+
         if self._cached_cart_items:
-            items = self._cached_cart_items
+            items = CartItemModel.objects.refresh_cart_items(self, self._cached_cart_items, request)
         else:
             items = CartItemModel.objects.filter_cart_items(self, request)
 
+        # Reuse the computation of a previous request, if neither the cart nor the vary keys of
+        # the modifiers changed in the meantime. Never do this while checking out.
+        vary_key = cache_key = None
+        if use_cache and not raise_exception and self.pk and app_settings.CACHE_DURATIONS['computed_cart']:
+            vary_key = self.get_cache_vary_key(request)
+            cache_key = self.get_cache_key(vary_key)
+        if cache_key and self.restore_from_cache(cache_key, items):
+            # the products still are required to render the items
+            CartItemModel.objects.prefetch_products(items)
+            self._cached_cart_items = items
+            self._dirty = False
+            return
+
+        # Load all products and resolve their availability in bulk, so that the cart modifiers
+        # do not have to do this item by item.
+        CartItemModel.objects.prefetch_cart_items(items, request)
+
+        # If all modifiers processing cart items are line-local, reuse the computation of those
+        # items which did not change since, so that only the changed items have to be repriced.
+        restored_items = ()
+        if cache_key and plan.is_line_local():
+            restored_items = self.restore_items_from_cache(items, vary_key)
+
         # This calls all the pre_process_cart methods and the pre_process_cart_item for each item,
         # before processing the cart. This allows to prepare and collect data on the cart.
-        for modifier in cart_modifiers_pool.get_all_modifiers():
-            modifier.pre_process_cart(self, request, raise_exception)
-            for item in items:
-                modifier.pre_process_cart_item(self, item, request, raise_exception)
+        for modifier in plan.get('pre_process_cart', 'pre_process_cart_item'):
+            if modifier in plan['pre_process_cart']:
+                modifier.pre_process_cart(self, request, raise_exception)
+            if modifier in plan['pre_process_cart_item']:
+                for item in items:
+                    if item.pk not in restored_items:
+                        modifier.pre_process_cart_item(self, item, request, raise_exception)
 
         self.extra_rows = OrderedDict()  # reset the dictionary
         self.subtotal = 0  # reset the subtotal
@@ -249,21 +550,94 @@ class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
             self.subtotal += item.line_total
 
         # Iterate over the registered modifiers, to process the cart's summary
-        for modifier in cart_modifiers_pool.get_all_modifiers():
-            for item in items:
-                modifier.post_process_cart_item(self, item, request)
-            modifier.process_cart(self, request)
+        for modifier in plan.get('post_process_cart_item', 'process_cart'):
+            if modifier in plan['post_process_cart_item']:
+                for item in items:
+                    modifier.post_process_cart_item(self, item, request)
+            if modifier in plan['process_cart']:
+                modifier.process_cart(self, request)
 
         # This calls the post_process_cart method from cart modifiers, if any.
         # It allows for a last bit of processing on the "finished" cart, before
         # it is displayed
-        for modifier in reversed(cart_modifiers_pool.get_all_modifiers()):
+        for modifier in reversed(plan['post_process_cart']):
             modifier.post_process_cart(self, request)
 
+        if cache_key:
+            self.store_in_cache(cache_key, items, vary_key)
+
         # Cache updated cart items
         self._cached_cart_items = items
         self._dirty = False
 
+    def get_cache_vary_key(self, request):
+        """
+        Returns the active language and the vary keys of all cart modifiers, joined into one string.
+        The language is always included, since the labels of the extra rows are translated.
+        """
+        plan = cart_modifiers_pool.get_execution_plan()
+        vary_keys = [get_language()]
+        vary_keys.extend(modifier.get_cache_vary_key(self, request) for modifier in plan['get_cache_vary_key'])
+        return '-'.join(str(key) for key in vary_keys)
+
+    def get_cache_key(self, vary_key):
+        """
+        Returns the key used to cache the computed cart across requests. This key depends on the
+        version of the cart, which is the timestamp of its latest modification as stored in the
+        database, and on the vary keys returned by the cart modifiers.
+        """
+        version = type(self).objects.filter(pk=self.pk).values_list('updated_at', flat=True).first()
+        if version is not None:
+            return 'cart:{0}|{1}-{2}'.format(self.pk, version.isoformat(), vary_key)
+
+    def store_in_cache(self, cache_key, items, vary_key):
+        """
+        Store the computed subtotal, total and extra rows of this cart. The computation of each
+        item is additionally stored on its own, so that it can be reused after other items of
+        this cart changed.
+        """
+        computed = {
+            'subtotal': self.subtotal,
+            'total': self.total,
+            'extra_rows': [(modifier, extra_row.instance) for modifier, extra_row in self.extra_rows.items()],
+            'items': {item.pk: item.get_computed_state() for item in items},
+        }
+        timeout = app_settings.CACHE_DURATIONS['computed_cart']
+        cache.set(cache_key, computed, timeout)
+        cache.set_many({item.get_cache_key(vary_key): computed['items'][item.pk] for item in items}, timeout)
+
+    def restore_from_cache(self, cache_key, items):
+        """
+        Restore the computed subtotal, total and extra rows of this cart and its items.
+
+        :returns: ``True`` if the cache contained a computation for exactly these items.
+        """
+        from shop.serializers.cart import ExtraCartRow
+
+        computed = cache.get(cache_key)
+        if computed is None or set(item.pk for item in items) != set(computed['items'].keys()):
+            return False
+        for item in items:
+            item.set_computed_state(computed['items'][item.pk])
+        self.subtotal = computed['subtotal']
+        self.total = computed['total']
+        self.extra_rows = OrderedDict((modifier, ExtraCartRow(instance))
+                                      for modifier, instance in computed['extra_rows'])
+        return True
+
+    def restore_items_from_cache(self, items, vary_key):
+        """
+        Restore the computation of those items which did not change since they have been stored.
+
+        :returns: A set with the primary keys of the restored items.
+        """
+        cache_keys = {item.get_cache_key(vary_key): item for item in items}
+        restored_items = set()
+        for cache_key, computed_item in cache.get_many(cache_keys.keys()).items():
+            cache_keys[cache_key].set_computed_state(computed_item)
+            restored_items.add(cache_keys[cache_key].pk)
+        return restored_items
+
     def empty(self):
         """
         Remove the cart with all its items.
@@ -275,21 +649,62 @@ class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
     def merge_with(self, other_cart):
         """
         Merge the contents of the other cart into this one, afterwards delete it.
-        This is done item by item, so that duplicate items increase the quantity.
+        Items considered as equal, ie. referring to the same product and having the same equality
+        key, as returned by the product's method ``get_cart_item_key()``, are merged by summing up
+        their quantities. This is performed set-based within one transaction, rather than item by item.
         """
-        # iterate over the cart and add quantities for items from other cart considered as equal
         if self.id == other_cart.id:
             raise RuntimeError("Can not merge cart with itself")
-        for item in self.items.all():
-            other_item = item.product.is_in_cart(other_cart, extra=item.extra)
-            if other_item:
-                item.quantity += other_item.quantity
-                item.save()
-                other_item.delete()
-
-        # the remaining items from the other cart are merged into this one
-        other_cart.items.update(cart=self)
-        other_cart.delete()
+        CartItem = self.items.model
+        with transaction.atomic():
+            cart_items = list(CartItem.objects.select_for_update().filter(cart__in=[self, other_cart]))
+            CartItem.objects.prefetch_products(cart_items)
+            other_items = OrderedDict()
+            for item in cart_items:
+                if item.cart_id == other_cart.id:
+                    other_items[item.pk] = item
+
+            # find the items from the other cart considered as equal to the items of this cart
+            items_by_key = {}
+            for item in other_items.values():
+                items_by_key.setdefault(item.get_merge_key(), []).append(item)
+            merged_items = []
+            for item in cart_items:
+                if item.cart_id != self.id:
+                    continue
+                product_class = type(item.product)
+                if product_class.is_in_cart is not BaseProduct.is_in_cart \
+                        and product_class.get_cart_item_key is BaseProduct.get_cart_item_key:
+                    # the product customizes `is_in_cart()` without providing an equality key
+                    other_item = item.product.is_in_cart(other_cart, extra=item.extra)
+                    other_item = other_items.get(other_item.pk) if other_item else None
+                else:
+                    candidates = items_by_key.get(item.get_merge_key(), [])
+                    other_item = next((c for c in candidates if c.pk in other_items), None)
+                if other_item and other_item.pk in other_items:
+                    merged_items.append((item, other_items.pop(other_item.pk)))
+
+            # add up the quantities of equal items and discard their duplicates
+            num_items = sum(int(item.quantity > 0) for item in other_items.values())
+            total_quantity = sum(item.quantity for item in other_items.values())
+            if merged_items:
+                now = timezone.now()
+                quantities = [models.When(pk=item.pk, then=models.Value(item.quantity + other_item.quantity))
+                              for item, other_item in merged_items]
+                CartItem.objects.filter(pk__in=[item.pk for item, _ in merged_items]).update(
+                    quantity=models.Case(*quantities, output_field=CartItem._meta.get_field('quantity')),
+                    updated_at=now,
+                )
+                CartItem.objects.filter(pk__in=[other_item.pk for _, other_item in merged_items]).delete()
+                for item, other_item in merged_items:
+                    num_items += int(item.quantity == 0 and other_item.quantity > 0)
+                    total_quantity += other_item.quantity
+
+            # the remaining items from the other cart are moved into this one
+            if other_items:
+                CartItem.objects.filter(pk__in=list(other_items.keys())).update(cart=self)
+            other_cart.delete()
+            self.touch(num_items=num_items, total_quantity=total_quantity)
 
     def __str__(self):
         return "{}".format(self.pk) if self.pk else "(unsaved)"
@@ -299,21 +714,21 @@ class BaseCart(models.Model, metaclass=deferred.ForeignKeyBuilder):
         """
         Returns the number of items in the cart.
         """
-        return self.items.filter(quantity__gt=0).count()
+        return self._num_items
 
     @property
     def total_quantity(self):
         """
         Returns the total quantity of all items in the cart.
         """
-        aggr = self.items.aggregate(quantity=models.Sum('quantity'))
-        return aggr['quantity'] or 0
-        # if we would know, that self.items is already evaluated, then this might be faster:
-        # return sum([ci.quantity for ci in self.items.all()])
+        total_quantity = self._total_quantity
+        if total_quantity == int(total_quantity):
+            return int(total_quantity)
+        return total_quantity
 
     @property
     def is_empty(self):
-        return self.num_items == 0 and self.total_quantity == 0
+        return self._num_items == 0 and self._total_quantity == 0
 
     def get_caption_data(self):
         warnings.warn("This method is deprecated")
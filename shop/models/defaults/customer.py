@@ -3,6 +3,7 @@ from django.template.loader import select_template
 from django.utils.translation import gettext_lazy as _
 from shop.conf import app_settings
 from shop.models.customer import BaseCustomer
+from shop.models.sequence import next_sequence_value
 
 
 class Customer(BaseCustomer):
@@ -31,12 +32,25 @@ class Customer(BaseCustomer):
         return self.number
 
     def get_or_assign_number(self):
+        """
+        Assign a unique number to this customer, allocated from a sequence, unless it already has one.
+        """
         if self.number is None:
-            aggr = Customer.objects.filter(number__isnull=False).aggregate(models.Max('number'))
-            self.number = (aggr['number__max'] or 0) + 1
-            self.save()
+            self.number = next_sequence_value(
+                'customer_number',
+                initial=self.get_max_number,
+                block_size=app_settings.SEQUENCE_BLOCK_SIZES['customer_number'],
+            )
+            self.save(update_fields=['number'])
         return self.get_number()
 
+    @classmethod
+    def get_max_number(cls):
+        """
+        Returns the highest customer number assigned so far. It is used to seed the sequence.
+        """
+        return cls.objects.aggregate(models.Max('number'))['number__max'] or 0
+
     def as_text(self):
         template_names = [
             '{}/customer.txt'.format(app_settings.APP_LABEL),
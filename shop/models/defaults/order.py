@@ -5,7 +5,9 @@ from urllib.parse import urljoin
 from django.db import models
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _, pgettext_lazy
+from shop.conf import app_settings
 from shop.models import order
+from shop.models.sequence import next_sequence_value
 
 
 class Order(order.BaseOrder):
@@ -42,22 +44,35 @@ class Order(order.BaseOrder):
     class Meta:
         verbose_name = pgettext_lazy('order_models', "Order")
         verbose_name_plural = pgettext_lazy('order_models', "Orders")
+        indexes = [
+            # supports listing the orders of a customer, ordered by their creation date
+            models.Index(fields=['customer', 'created_at'], name='shop_order_customer_created'),
+        ]
 
     def get_or_assign_number(self):
         """
         Set a unique number to identify this Order object. The first 4 digits represent the
-        current year. The last five digits represent a zero-padded incremental counter.
+        current year. The last five digits represent a zero-padded incremental counter, allocated
+        from a sequence restarting each year.
         """
         if self.number is None:
             epoch = timezone.now()
             epoch = epoch.replace(epoch.year, 1, 1, 0, 0, 0, 0)
-            aggr = Order.objects.filter(number__isnull=False, created_at__gt=epoch).aggregate(models.Max('number'))
-            try:
-                epoc_number = int(str(aggr['number__max'])[4:]) + 1
-                self.number = int('{0}{1:05d}'.format(epoch.year, epoc_number))
-            except (KeyError, ValueError):
-                # the first order this year
-                self.number = int('{0}00001'.format(epoch.year))
+
+            def initial():
+                # continue with the orders numbered before the sequence of this year existed
+                aggr = Order.objects.filter(number__isnull=False, created_at__gt=epoch).aggregate(models.Max('number'))
+                try:
+                    return int(str(aggr['number__max'])[4:])
+                except (KeyError, ValueError):
+                    return 0
+
+            epoch_number = next_sequence_value(
+                'order_number:{}'.format(epoch.year),
+                initial=initial,
+                block_size=app_settings.SEQUENCE_BLOCK_SIZES['order_number'],
+            )
+            self.number = int('{0}{1:05d}'.format(epoch.year, epoch_number))
         return self.get_number()
 
     def get_number(self):
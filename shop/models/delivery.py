@@ -1,9 +1,9 @@
 from django.core import checks
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
 from shop import deferred
-from shop.models.order import BaseOrder, BaseOrderItem, OrderItemModel
+from shop.models.order import BaseOrder, BaseOrderItem, OrderModel, OrderItemModel
 from shop.modifiers.pool import cart_modifiers_pool
 
 
@@ -107,6 +107,17 @@ class BaseDeliveryItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
         verbose_name = _("Deliver item")
         verbose_name_plural = _("Deliver items")
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            OrderModel.objects.update_summaries(items=self.item_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            OrderModel.objects.update_summaries(items=self.item_id)
+        return result
+
     @classmethod
     def check(cls, **kwargs):
         errors = super().check(**kwargs)
@@ -49,6 +49,40 @@ class AvailableProductMixin:
             return create_availability(sell_short=True)
         return Availability(quantity=0)
 
+    @classmethod
+    def get_availabilities(cls, products, request):
+        """
+        Returns the current available quantity for each of the given products. In comparison to
+        ``get_availability()``, the inventories of all products are fetched using one query.
+        """
+        def create_availability(inventory_set, **kwargs):
+            quantity = sum(inventory.quantity for inventory in inventory_set)
+            earliest = min(inventory.earliest for inventory in inventory_set)
+            latest = max(inventory.latest for inventory in inventory_set)
+            if latest < now + app_settings.SHOP_LIMITED_OFFER_PERIOD:
+                kwargs['limited_offer'] = True
+            return Availability(quantity=quantity, earliest=earliest, latest=latest, **kwargs)
+
+        now = timezone.now()
+        later = now + app_settings.SHOP_SELL_SHORT_PERIOD
+        inventories = {product.pk: [] for product in products}
+        InventoryModel = cls._meta.get_field('inventory_set').related_model
+        for inventory in InventoryModel.objects.filter(product__in=list(inventories.keys()),
+                                                       earliest__lt=later, latest__gt=now, quantity__gt=0):
+            inventories[inventory.product_id].append(inventory)
+
+        availabilities = {}
+        for pk, inventory_set in inventories.items():
+            in_stock = [inventory for inventory in inventory_set if inventory.earliest < now]
+            if in_stock:
+                availabilities[pk] = create_availability(in_stock)
+            elif inventory_set:
+                # check, if we can sell short
+                availabilities[pk] = create_availability(inventory_set, sell_short=True)
+            else:
+                availabilities[pk] = Availability(quantity=0)
+        return availabilities
+
     def deduct_from_stock(self, quantity, **kwargs):
         """
         Deduce requested quantity from all available inventories.
@@ -1,8 +1,14 @@
+import threading
+from uuid import uuid4
+
 from django.conf import settings
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
-from post_office.models import EmailTemplate
+from post_office.models import Attachment, EmailTemplate
 from filer.fields.file import FilerFileField
 from shop.conf import app_settings
 from shop.models.fields import ChoiceEnum, ChoiceEnumField
@@ -15,6 +21,44 @@ class Notify(ChoiceEnum):
     NOBODY = 9, _("Nobody")
 
 
+class NotificationManager(models.Manager):
+    """
+    Keeps all notifications, together with their attachments and mail templates, in an in-process
+    index keyed by their transition target. Since these rows rarely change, an order transition
+    then has to query the database only, if there is a notification to be sent.
+
+    Whenever a notification or one of its attachments is saved or deleted, the index is discarded.
+    Other processes are informed through a version number stored in Django's cache, hence with a
+    cache shared by all processes, they rebuild their index on its next lookup.
+    """
+    cache_key = 'shop:notification_index'
+    _index = _version = None
+    _lock = threading.Lock()
+
+    def get_for_transition(self, transition_target):
+        """
+        Returns the list of notifications to be sent, after an order performed a transition to
+        the given target.
+        """
+        version = cache.get(self.cache_key)
+        with self._lock:
+            if self._index is None or self._version != version:
+                # the recipients are not indexed, since their email addresses may change meanwhile
+                queryset = self.select_related('mail_template').prefetch_related(
+                    'mail_template__translated_templates', 'notificationattachment_set__attachment',
+                    'notificationattachment_set__email_attachment')
+                index = {}
+                for notification in queryset:
+                    index.setdefault(notification.transition_target, []).append(notification)
+                NotificationManager._index, NotificationManager._version = index, version
+            return self._index.get(transition_target, [])
+
+    def invalidate_index(self):
+        with self._lock:
+            NotificationManager._index = None
+        cache.set(self.cache_key, uuid4().hex, None)
+
+
 class Notification(models.Model):
     """
     A task executed on receiving a signal.
@@ -49,6 +93,8 @@ class Notification(models.Model):
         limit_choices_to=Q(language__isnull=True) | Q(language=''),
     )
 
+    objects = NotificationManager()
+
     class Meta:
         app_label = 'shop'
         verbose_name = _("Notification")
@@ -60,7 +106,10 @@ class Notification(models.Model):
 
     def get_recipient(self, order):
         if self.notify is Notify.RECIPIENT:
-            return self.recipient.email
+            # do not cache the recipient on a notification kept in the index
+            user_model = self._meta.get_field('recipient').related_model
+            recipient = user_model._default_manager.filter(pk=self.recipient_id).first()
+            return recipient.email if recipient else None
         if self.notify is Notify.CUSTOMER:
             return order.customer.email
         if self.notify is Notify.VENDOR:
@@ -68,6 +117,16 @@ class Notification(models.Model):
                 return order.vendor.email
             return app_settings.SHOP_VENDOR_EMAIL
 
+    def get_mail_template(self, language):
+        """
+        Returns the translation of the mail template for the given language, falling back to the
+        template itself.
+        """
+        for template in self.mail_template.translated_templates.all():
+            if template.language == language:
+                return template
+        return self.mail_template
+
 
 class NotificationAttachment(models.Model):
     notification = models.ForeignKey(
@@ -82,5 +141,92 @@ class NotificationAttachment(models.Model):
         blank=True,
     )
 
+    email_attachment = models.ForeignKey(
+        Attachment,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        editable=False,
+    )
+
     class Meta:
         app_label = 'shop'
+
+    def save(self, *args, **kwargs):
+        # the attachment may have been replaced
+        self.email_attachment = None
+        super().save(*args, **kwargs)
+
+    def get_email_attachment(self):
+        """
+        Returns the attachment of the Post-Office, which is shared by all emails sent for this
+        notification. On first use, the file is copied once into the storage of the Post-Office.
+        The emails then only refer to it, and their content is read while sending them.
+        """
+        if self.email_attachment is None and self.attachment is not None:
+            email_attachment = Attachment(name=self.attachment.original_filename)
+            with self.attachment.file.open('rb') as content:
+                email_attachment.file.save(self.attachment.original_filename, content)
+            NotificationAttachment.objects.filter(pk=self.pk).update(email_attachment=email_attachment)
+            self.email_attachment = email_attachment
+        return self.email_attachment
+
+
+@receiver([post_save, post_delete], sender=Notification)
+@receiver([post_save, post_delete], sender=NotificationAttachment)
+@receiver([post_save, post_delete], sender=EmailTemplate)
+def invalidate_notification_index(sender, **kwargs):
+    """
+    Discard the index of notifications, after one of them, their attachments or their mail
+    templates changed. This must be deferred until the change has been committed, otherwise
+    another process could rebuild its index from the previous rows meanwhile.
+    """
+    transaction.on_commit(Notification.objects.invalidate_index)
+
+
+@receiver(pre_delete, sender=Attachment)
+def forget_email_attachment(sender, instance, **kwargs):
+    """
+    After the Post-Office purged a copied notification attachment together with the emails
+    referring to it, the copy must not be reused by the index of notifications.
+    """
+    if NotificationAttachment.objects.filter(email_attachment=instance).exists():
+        transaction.on_commit(Notification.objects.invalidate_index)
+
+
+def invalidate_email_attachments(sender, instance, **kwargs):
+    """
+    After a file used as notification attachment changed, copy it again on its next use.
+    This receiver is connected to all models derived from Filer's ``File`` by the app config.
+    """
+    if NotificationAttachment.objects.filter(attachment=instance).update(email_attachment=None):
+        transaction.on_commit(Notification.objects.invalidate_index)
+
+
+class QueuedNotification(models.Model):
+    """
+    An order, which performed a transition to a target having notifications. It is added to the
+    queue within the transaction saving the order and consumed by ``./manage.py shop notifications``.
+    """
+    order_id = models.BigIntegerField(
+        _("Order ID"),
+    )
+
+    transition_target = models.CharField(
+        max_length=50,
+        verbose_name=_("Event"),
+    )
+
+    created_at = models.DateTimeField(
+        _("Created at"),
+        auto_now_add=True,
+    )
+
+    class Meta:
+        app_label = 'shop'
+        verbose_name = _("Queued notification")
+        verbose_name_plural = _("Queued notifications")
+        ordering = ['id']
+
+    def __str__(self):
+        return "{}: {}".format(self.order_id, self.transition_target)
@@ -1,13 +1,16 @@
 from decimal import Decimal
 import logging
 from urllib.parse import urljoin
+import zlib
 
 from django.core import checks
-from django.core.exceptions import ImproperlyConfigured
+from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.db import models, transaction
 from django.db.models.aggregates import Sum
+from django.db.models.deletion import Collector
+from django.db.models.functions import Coalesce
 from django.urls import NoReverseMatch, reverse
-from django.utils.functional import cached_property
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _, pgettext_lazy, get_language_from_request
 
 from django_fsm import FSMField, transition
@@ -16,9 +19,11 @@ from cms.models import Page
 from shop.conf import app_settings
 from shop.models.cart import CartItemModel
 from shop.models.fields import JSONField
+from shop.money import serializers as money_serializers
 from shop.money.fields import MoneyField, MoneyMaker
 from shop import deferred
 from shop.models.product import BaseProduct
+from shop.models.rollup import DailyProductSales, DailyRevenue, OrderStatusCount
 
 
 class OrderQuerySet(models.QuerySet):
@@ -45,6 +50,37 @@ class OrderQuerySet(models.QuerySet):
 class OrderManager(models.Manager):
     _queryset_class = OrderQuerySet
 
+    def update_summaries(self, **filters):
+        """
+        Recompute the denormalized amount paid and unfulfilled quantity from the payments, the
+        ordered items and their deliveries, for all orders or just for those matching the given
+        filters, using one query.
+
+        :returns: The number of updated orders.
+        """
+        payments = OrderPayment.objects.filter(order=models.OuterRef('pk')).order_by().values('order')
+        amount_paid = payments.annotate(amount=Sum('amount')).values('amount')
+        has_canceled = any(field.name == 'canceled' for field in OrderItemModel._meta.fields)
+        order_items = OrderItemModel.objects.filter(order=models.OuterRef('pk'))
+        if has_canceled:
+            order_items = order_items.filter(canceled=False)
+        ordered = order_items.order_by().values('order').annotate(quantity=Sum('quantity')).values('quantity')
+        unfulfilled_quantity = Coalesce(models.Subquery(ordered), 0, output_field=models.DecimalField())
+        for rel in OrderItemModel._meta.related_objects:
+            if rel.name == 'deliver_item':
+                # subtract the quantities delivered so far
+                delivered = rel.related_model.objects.filter(item__order=models.OuterRef('pk'))
+                if has_canceled:
+                    delivered = delivered.filter(item__canceled=False)
+                delivered = delivered.order_by().values('item__order')
+                delivered = delivered.annotate(quantity=Sum('quantity')).values('quantity')
+                unfulfilled_quantity -= Coalesce(models.Subquery(delivered), 0, output_field=models.DecimalField())
+                break
+        return self.filter(**filters).update(
+            _amount_paid=Coalesce(models.Subquery(amount_paid), 0, output_field=models.DecimalField()),
+            _unfulfilled_quantity=unfulfilled_quantity,
+        )
+
     def create_from_cart(self, cart, request):
         """
         This creates a new empty Order object with a valid order number (many payment service
@@ -54,7 +90,7 @@ class OrderManager(models.Manager):
         in state ``new``. The latter can happen, if a payment service provider did not acknowledge
         a payment, hence the items remain in the cart.
         """
-        cart.update(request)
+        cart.update(request, use_cache=False)
         cart.customer.get_or_assign_number()
         order = self.model(
             customer=cart.customer,
@@ -182,6 +218,22 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
         **decimalfield_kwargs
     )
 
+    # denormalized summaries, maintained by the payments, ordered items and their deliveries
+    _amount_paid = models.DecimalField(
+        _("Amount paid"),
+        default=0,
+        editable=False,
+        **decimalfield_kwargs
+    )
+
+    _unfulfilled_quantity = models.DecimalField(
+        _("Unfulfilled quantity"),
+        max_digits=30,
+        decimal_places=3,
+        default=0,
+        editable=False,
+    )
+
     created_at = models.DateTimeField(
         _("Created at"),
         auto_now_add=True,
@@ -203,16 +255,25 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
 
     objects = OrderManager()
 
+    summary_fields = ['_amount_paid', '_unfulfilled_quantity']
+
     class Meta:
         abstract = True
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.logger = logging.getLogger('shop.order')
+        self._saved_status = self.__dict__.get('status')  # may be deferred
 
     def __str__(self):
         return self.get_number()
 
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        if fields is None or 'status' in fields:
+            # the status has been deferred or modified by another process
+            self._saved_status = self.__dict__.get('status')
+
     def __repr__(self):
         return "<{}(pk={})>".format(self.__class__.__name__, self.pk)
 
@@ -284,39 +345,86 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
         that cart item.
 
         Override this method, in case a customized cart has some fields which have to be transferred
-        to the cart.
+        to the cart. In order to customize each order item, override its method
+        ``populate_from_cart_item()`` instead.
+
+        The cart items, as computed by ``cart.update(request)``, are reused. If the cart changed
+        since, it is recomputed, but never restored from the cache, since the order items are legally
+        binding. All order items are created using one query and all transferred cart items are
+        deleted using one query.
         """
         assert hasattr(cart, 'subtotal') and hasattr(cart, 'total'), \
             "Did you forget to invoke 'cart.update(request)' before populating from cart?"
-        for cart_item in cart.items.all():
-            cart_item.update(request)
-            order_item = OrderItemModel(order=self)
-            try:
-                order_item.populate_from_cart_item(cart_item, request)
-                order_item.save()
-                cart_item.delete()
-            except CartItemModel.DoesNotExist:
-                pass
-        self._subtotal = Decimal(cart.subtotal)
-        self._total = Decimal(cart.total)
-        self.extra = dict(cart.extra)
-        self.extra.update(rows=[(modifier, extra_row.data) for modifier, extra_row in cart.extra_rows.items()])
-        self.save()
+        cart.update(request, use_cache=False)
+        with transaction.atomic():
+            order_items, cart_items = [], []
+            for cart_item in cart._cached_cart_items or []:
+                order_item = OrderItemModel(order=self)
+                try:
+                    order_item.populate_from_cart_item(cart_item, request)
+                except CartItemModel.DoesNotExist:
+                    continue
+                order_items.append(order_item)
+                cart_items.append(cart_item)
+            if OrderItemModel.save is BaseOrderItem.save:
+                for order_item in order_items:
+                    order_item.round_amounts()
+                OrderItemModel.objects.bulk_create(order_items)
+                OrderModel.objects.update_summaries(pk=self.pk)
+            else:
+                # the materialized order item customizes its save method
+                for order_item in order_items:
+                    order_item.save()
+            if cart_items:
+                CartItemModel.objects.filter(pk__in=[cart_item.pk for cart_item in cart_items]).delete()
+                cart.touch(num_items=-sum(int(cart_item._saved_quantity > 0) for cart_item in cart_items),
+                           total_quantity=-sum(cart_item._saved_quantity for cart_item in cart_items))
+            self._subtotal = Decimal(cart.subtotal)
+            self._total = Decimal(cart.total)
+            self.extra = dict(cart.extra)
+            self.extra.update(rows=[(modifier, extra_row.data) for modifier, extra_row in cart.extra_rows.items()])
+            self.save()
+            self.refresh_from_db(fields=self.summary_fields)
+
+    def rollup_sales(self, order_items):
+        """
+        Add this order's totals and the quantities of its items to the daily sales rollups. This is
+        done once, when the order is saved after leaving status ``new``, which is the same criterion
+        as applied by :func:`shop.models.rollup.rebuild_rollups`.
+        """
+        date = timezone.localdate(self.created_at) if timezone.is_aware(self.created_at) else self.created_at.date()
+        DailyRevenue.objects.increment_on_commit({'date': date, 'currency': self.currency},
+                                                 num_orders=1, subtotal=self._subtotal, total=self._total)
+        quantities = {}
+        for order_item in order_items:
+            product_code = order_item.product_code or ''
+            quantities[product_code] = quantities.get(product_code, 0) + order_item.quantity
+        for product_code, quantity in quantities.items():
+            DailyProductSales.objects.increment_on_commit({'date': date, 'product_code': product_code},
+                                                          quantity=quantity)
 
     @transaction.atomic
     def readd_to_cart(self, cart):
         """
-        Re-add the items of this order back to the cart.
+        Re-add the items of this order back to the cart. This also works for orders rehydrated
+        from the archive. Items whose product does not exist anymore, are skipped.
         """
         for order_item in self.items.all():
+            try:
+                product = order_item.product
+            except ObjectDoesNotExist:
+                # the product has been deleted after this order has been archived
+                continue
+            if product is None:
+                continue
             extra = dict(order_item.extra)
             extra.pop('rows', None)
             extra.update(product_code=order_item.product_code)
-            cart_item = order_item.product.is_in_cart(cart, **extra)
+            cart_item = product.is_in_cart(cart, **extra)
             if cart_item:
                 cart_item.quantity = max(cart_item.quantity, order_item.quantity)
             else:
-                cart_item = CartItemModel(cart=cart, product=order_item.product,
+                cart_item = CartItemModel(cart=cart, product=product,
                                           product_code=order_item.product_code,
                                           quantity=order_item.quantity, extra=extra)
             cart_item.save()
@@ -328,6 +436,14 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
         """
         from shop.transition import transition_change_notification
 
+        if getattr(self, '_archived_order', None):
+            # a rehydrated order is moved back from the archive, before being modified
+            self._archived_order.restore()
+            self._state.adding = False
+            del self._archived_order
+        elif self.pk and 'status' in self.get_deferred_fields():
+            # the FSM field does not load a deferred status by itself
+            self.refresh_from_db(fields=['status'])
         auto_transition = self._auto_transitions.get(self.status)
         if callable(auto_transition):
             auto_transition(self)
@@ -335,19 +451,39 @@ class BaseOrder(models.Model, metaclass=WorkflowMixinMetaclass):
         # round the total to the given decimal_places
         self._subtotal = BaseOrder.round_amount(self._subtotal)
         self._total = BaseOrder.round_amount(self._total)
-        super().save(**kwargs)
+        saved_status = None if self._state.adding else self._saved_status
+        if self.pk and not self._state.adding and not {'update_fields', 'force_insert'} & set(kwargs):
+            # the summaries are maintained by the related objects, never overwrite them
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name not in self.summary_fields]
+        with transaction.atomic():
+            super().save(**kwargs)
+            if saved_status != self.status:
+                # keep track on the number of orders per status
+                if saved_status:
+                    OrderStatusCount.objects.increment_on_commit({'status': saved_status}, count=-1)
+                OrderStatusCount.objects.increment_on_commit({'status': self.status}, count=1)
+                if saved_status in (None, 'new') and self.status != 'new':
+                    self.rollup_sales(self.items.all())
+        self._saved_status = self.status
         if with_notification:
             transition_change_notification(self)
 
-    @cached_property
+    @property
     def amount_paid(self):
         """
-        The amount paid is the sum of related orderpayments
+        The amount paid is the sum of related orderpayments, as maintained by them.
+        """
+        return MoneyMaker(self.currency)(self._amount_paid)
+
+    @property
+    def unfulfilled_quantity(self):
+        """
+        The quantity of ordered items which neither have been delivered nor canceled yet.
         """
-        amount = self.orderpayment_set.aggregate(amount=Sum('amount'))['amount']
-        if amount is None:
-            amount = MoneyMaker(self.currency)()
-        return amount
+        if self._unfulfilled_quantity == int(self._unfulfilled_quantity):
+            return int(self._unfulfilled_quantity)
+        return self._unfulfilled_quantity
 
     @property
     def outstanding_amount(self):
@@ -449,6 +585,23 @@ class OrderPayment(models.Model, metaclass=deferred.ForeignKeyBuilder):
     def __str__(self):
         return _("Payment ID: {}").format(self.id)
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_order_summaries()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            self.update_order_summaries()
+        return result
+
+    def update_order_summaries(self):
+        OrderModel.objects.update_summaries(pk=self.order_id)
+        if self._meta.get_field('order').is_cached(self):
+            # the payment provider usually continues with a transition of this very order object
+            self.order.refresh_from_db(fields=['_amount_paid'])
+
 
 class BaseOrderItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
     """
@@ -566,8 +719,123 @@ class BaseOrderItem(models.Model, metaclass=deferred.ForeignKeyBuilder):
         """
         Before saving the OrderItem object to the database, round the amounts to the given decimal places
         """
+        self.round_amounts()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            OrderModel.objects.update_summaries(pk=self.order_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            OrderModel.objects.update_summaries(pk=self.order_id)
+        return result
+
+    def round_amounts(self):
         self._unit_price = BaseOrder.round_amount(self._unit_price)
         self._line_total = BaseOrder.round_amount(self._line_total)
-        super().save(*args, **kwargs)
 
 OrderItemModel = deferred.MaterializedModel(BaseOrderItem)
+
+
+class ArchivedOrderManager(models.Manager):
+    def archive(self, order):
+        """
+        Move the given order together with all objects depending on it, such as its items, payments
+        and deliveries, into a compressed snapshot and delete their rows.
+        """
+        with transaction.atomic(using=self.db):
+            collector = Collector(using=self.db)
+            collector.collect([order])
+            collector.sort()
+            # the collector sorts for deletion, hence reverse it to restore the dependencies first
+            objects = [obj for instances in reversed(list(collector.data.values())) for obj in instances]
+            for queryset in collector.fast_deletes:
+                objects.extend(queryset)
+            archived_order = self.create(
+                number=order.get_number(),
+                customer_id=order.customer_id,
+                created_at=order.created_at,
+                data=zlib.compress(money_serializers.Serializer().serialize(objects).encode('utf-8')),
+            )
+            collector.delete()
+            OrderStatusCount.objects.increment_on_commit({'status': order.status}, count=-1)
+        return archived_order
+
+
+class ArchivedOrder(models.Model, metaclass=deferred.ForeignKeyBuilder):
+    """
+    A compressed snapshot of an order, which has been moved out of the tables of orders, order items
+    and payments by ``./manage.py shop archive-orders``. Since an order does not change anymore after
+    reaching a final state, its snapshot can be rehydrated into an unsaved order object on demand.
+    """
+    number = models.CharField(
+        _("Order number"),
+        max_length=255,
+        unique=True,
+    )
+
+    customer = deferred.ForeignKey(
+        'BaseCustomer',
+        on_delete=models.CASCADE,
+        verbose_name=_("Customer"),
+    )
+
+    created_at = models.DateTimeField(
+        _("Created at"),
+    )
+
+    archived_at = models.DateTimeField(
+        _("Archived at"),
+        auto_now_add=True,
+    )
+
+    data = models.BinaryField(
+        help_text=_("The compressed serialization of the order and its depending objects."),
+    )
+
+    objects = ArchivedOrderManager()
+
+    class Meta:
+        verbose_name = pgettext_lazy('order_models', "Archived order")
+        verbose_name_plural = pgettext_lazy('order_models', "Archived orders")
+
+    def __str__(self):
+        return self.number
+
+    def get_objects(self):
+        return list(money_serializers.Deserializer(zlib.decompress(bytes(self.data)).decode('utf-8')))
+
+    def rehydrate(self):
+        """
+        Returns the archived order as an unsaved order object. Its items and payments are
+        prefetched, so that they can be accessed as usual, without querying the database.
+        Saving the returned order, restores it from the archive.
+        """
+        objects = [deserialized.object for deserialized in self.get_objects()]
+        order = next(obj for obj in objects if isinstance(obj, BaseOrder))
+        order._prefetched_objects_cache = {}
+        for rel in order._meta.related_objects:
+            if not rel.one_to_many:
+                continue
+            related_objects = []
+            for obj in objects:
+                if isinstance(obj, rel.related_model) and getattr(obj, rel.field.attname) == order.pk:
+                    rel.field.set_cached_value(obj, order)
+                    related_objects.append(obj)
+            queryset = rel.related_model._default_manager.none()
+            queryset._result_cache = related_objects
+            queryset._prefetch_done = True
+            order._prefetched_objects_cache[rel.get_accessor_name()] = queryset
+        order._archived_order = self
+        return order
+
+    def restore(self):
+        """
+        Moves the archived order back into the tables of orders, order items and payments.
+        """
+        with transaction.atomic():
+            for deserialized in self.get_objects():
+                deserialized.save()
+                if isinstance(deserialized.object, BaseOrder):
+                    OrderStatusCount.objects.increment_on_commit({'status': deserialized.object.status}, count=1)
+            self.delete()
@@ -81,6 +81,13 @@ class AvailableProductMixin:
         """
         return Availability(quantity=self.quantity)
 
+    @classmethod
+    def get_availabilities(cls, products, request):
+        """
+        Returns the current available quantity for each of the given products.
+        """
+        return {product.pk: Availability(quantity=product.quantity) for product in products}
+
     def deduct_from_stock(self, quantity, **kwargs):
         if quantity > self.quantity:
             raise ProductNotAvailable(self)
@@ -130,6 +137,20 @@ class BaseReserveProductMixin:
         availability.quantity -= cart_items.aggregate(sum=Coalesce(Sum('quantity'), 0))['sum']
         return availability
 
+    @classmethod
+    def get_availabilities(cls, products, request):
+        """
+        Returns the current available quantity for each of the given products, reduced by the
+        quantities kept in pending carts. All reservations are summed up using one query.
+        """
+        from shop.models.cart import CartItemModel
+
+        availabilities = super().get_availabilities(products, request)
+        cart_items = CartItemModel.objects.filter(product__in=list(availabilities.keys()))
+        for reserved in cart_items.values('product').annotate(sum=Sum('quantity')).order_by():
+            availabilities[reserved['product']].quantity -= reserved['sum'] or 0
+        return availabilities
+
 
 class ReserveProductMixin(BaseReserveProductMixin, AvailableProductMixin):
     """
@@ -289,6 +310,31 @@ class BaseProduct(PolymorphicModel, metaclass=PolymorphicProductMetaclass):
         """
         return Availability()
 
+    @classmethod
+    def get_availabilities(cls, products, request):
+        """
+        Hook for checking the availability of many products of this class at once. It is invoked
+        by :meth:`shop.models.cart.CartItemManager.prefetch_cart_items`, so that the availability
+        of all items in the cart can be resolved using a constant number of queries.
+
+        Product classes overriding ``get_availability()`` shall also override this method.
+        Otherwise, if this method is inherited from a less specific class, such as one of the
+        inventory mixins, it is ignored and the availability is checked item by item.
+
+        :param products:
+            A list of products, all of this class.
+
+        :param request:
+            Optionally used to vary the availability according to the logged in user,
+            its country code or language.
+
+        :return: A dictionary mapping the primary key of each product onto an object of type
+            :class:`shop.models.product.Availability`. Products missing in this dictionary, are
+            checked one by one using ``get_availability()``. This is what the default
+            implementation does, since products with variations usually require extra arguments.
+        """
+        return {}
+
     def managed_availability(self):
         """
         :return True: If this product has its quantity managed by some inventory functionality.
@@ -315,6 +361,23 @@ class BaseProduct(PolymorphicModel, metaclass=PolymorphicProductMetaclass):
         cart_item_qs = CartItemModel.objects.filter(cart=cart, product=self)
         return cart_item_qs.first()
 
+    def get_cart_item_key(self, product_code=None, extra=None):
+        """
+        Hook returning the equality key of a cart item referring to this product. Cart items of the
+        same product with the same equality key are considered as equal, for instance while merging
+        two carts, so that their quantities are summed up.
+
+        Product classes customizing method ``is_in_cart()`` shall override this hook accordingly,
+        otherwise cart items of their kind are looked up one by one using ``is_in_cart()``.
+
+        :param product_code: The product code as stored in the cart item.
+
+        :param extra: The extra information as stored in the cart item.
+
+        :returns: A hashable value. By default the product code, ignoring all extra information.
+        """
+        return product_code
+
     def deduct_from_stock(self, quantity, **kwargs):
         """
         Hook to deduct a number of items of the current product from the stock's inventory.
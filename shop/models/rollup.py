@@ -0,0 +1,195 @@
+from django.db import IntegrityError, models, transaction
+from django.utils.translation import gettext_lazy as _
+
+
+class RollupManager(models.Manager):
+    def increment(self, keys, **deltas):
+        """
+        Atomically add the given deltas to the fields of the rollup row identified by ``keys``.
+        If that row does not exist yet, it is created.
+        """
+        updates = {field: models.F(field) + delta for field, delta in deltas.items()}
+        with transaction.atomic(using=self.db):
+            if self.filter(**keys).update(**updates):
+                return
+            try:
+                with transaction.atomic(using=self.db):
+                    self.create(**keys, **deltas)
+            except IntegrityError:
+                # the row has been created concurrently by another process
+                self.filter(**keys).update(**updates)
+
+    def increment_on_commit(self, keys, **deltas):
+        """
+        Add the given deltas as :meth:`increment` does, but only after the current transaction has
+        been committed. The rollup row then is locked only briefly, rather than until the end of
+        that transaction, which would serialize concurrent checkouts and transitions.
+        """
+        transaction.on_commit(lambda: self.increment(keys, **deltas), using=self.db)
+
+
+class DailyRevenue(models.Model):
+    """
+    The number of orders and their summed up totals per day and currency.
+    """
+    date = models.DateField(
+        _("Date"),
+    )
+
+    currency = models.CharField(
+        _("Currency"),
+        max_length=7,
+    )
+
+    num_orders = models.PositiveIntegerField(
+        _("Number of orders"),
+        default=0,
+    )
+
+    subtotal = models.DecimalField(
+        _("Subtotal"),
+        max_digits=30,
+        decimal_places=2,
+        default=0,
+    )
+
+    total = models.DecimalField(
+        _("Total"),
+        max_digits=30,
+        decimal_places=2,
+        default=0,
+    )
+
+    objects = RollupManager()
+
+    class Meta:
+        app_label = 'shop'
+        unique_together = ['date', 'currency']
+        verbose_name = _("Daily revenue")
+        verbose_name_plural = _("Daily revenues")
+
+    def __str__(self):
+        return "{} {}: {}".format(self.date, self.currency, self.total)
+
+
+class DailyProductSales(models.Model):
+    """
+    The number of units sold per day and product, identified by its product code.
+    """
+    date = models.DateField(
+        _("Date"),
+    )
+
+    product_code = models.CharField(
+        _("Product code"),
+        max_length=255,
+    )
+
+    quantity = models.DecimalField(
+        _("Quantity"),
+        max_digits=30,
+        decimal_places=3,
+        default=0,
+    )
+
+    objects = RollupManager()
+
+    class Meta:
+        app_label = 'shop'
+        unique_together = ['date', 'product_code']
+        verbose_name = _("Daily product sales")
+        verbose_name_plural = _("Daily product sales")
+
+    def __str__(self):
+        return "{} {}: {}".format(self.date, self.product_code, self.quantity)
+
+
+class OrderStatusCount(models.Model):
+    """
+    The number of orders in each status.
+    """
+    status = models.CharField(
+        _("Status"),
+        max_length=50,
+        unique=True,
+    )
+
+    count = models.IntegerField(
+        _("Number of orders"),
+        default=0,
+    )
+
+    objects = RollupManager()
+
+    class Meta:
+        app_label = 'shop'
+        verbose_name = _("Order status count")
+        verbose_name_plural = _("Order status counts")
+
+    def __str__(self):
+        return "{}: {}".format(self.status, self.count)
+
+
+def rebuild_rollups():
+    """
+    Recompute all rollups from the orders and their items. Revenues and product sales are
+    recomputed only for the days since the earliest order still kept in the tables of orders,
+    folding in the snapshots of orders archived from those days. Earlier days consist of archived
+    orders only, hence their rollups are kept as maintained so far.
+    """
+    from datetime import datetime, time
+    from django.db.models import Count, Sum, Value
+    from django.db.models.functions import Coalesce, TruncDate
+    from django.utils import timezone
+    from shop.models.order import ArchivedOrder, BaseOrder, BaseOrderItem, OrderModel, OrderItemModel
+
+    def local_date(value):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+
+    with transaction.atomic():
+        orders = OrderModel.objects.exclude(status='new')
+        earliest = orders.order_by('created_at').values_list('created_at', flat=True).first()
+        if earliest is not None:
+            since = local_date(earliest)
+            revenues, sales = {}, {}
+            rows = orders.annotate(date=TruncDate('created_at')).order_by().values('date', 'currency').annotate(
+                sum_orders=Count('pk'), sum_subtotal=Sum('_subtotal'), sum_total=Sum('_total'))
+            for row in rows:
+                revenues[row['date'], row['currency']] = [row['sum_orders'], row['sum_subtotal'], row['sum_total']]
+            items = OrderItemModel.objects.exclude(order__status='new').order_by().annotate(
+                date=TruncDate('order__created_at'), code=Coalesce('product_code', Value('')))
+            for row in items.values('date', 'code').annotate(sum_quantity=Sum('quantity')):
+                sales[row['date'], row['code']] = row['sum_quantity']
+
+            start = datetime.combine(since, time.min)
+            if timezone.is_aware(earliest):
+                start = timezone.make_aware(start)
+            for archived_order in ArchivedOrder.objects.filter(created_at__gte=start).iterator():
+                objects = [deserialized.object for deserialized in archived_order.get_objects()]
+                order = next(obj for obj in objects if isinstance(obj, BaseOrder))
+                if order.status == 'new':
+                    continue
+                date = local_date(order.created_at)
+                revenue = revenues.setdefault((date, order.currency), [0, 0, 0])
+                revenue[0] += 1
+                revenue[1] += order._subtotal
+                revenue[2] += order._total
+                for obj in objects:
+                    if isinstance(obj, BaseOrderItem):
+                        key = date, obj.product_code or ''
+                        sales[key] = sales.get(key, 0) + obj.quantity
+
+            DailyRevenue.objects.filter(date__gte=since).delete()
+            DailyRevenue.objects.bulk_create(DailyRevenue(
+                date=date, currency=currency, num_orders=num_orders, subtotal=subtotal, total=total,
+            ) for (date, currency), (num_orders, subtotal, total) in revenues.items())
+            DailyProductSales.objects.filter(date__gte=since).delete()
+            DailyProductSales.objects.bulk_create(DailyProductSales(
+                date=date, product_code=product_code, quantity=quantity,
+            ) for (date, product_code), quantity in sales.items())
+
+        OrderStatusCount.objects.all().delete()
+        statuses = OrderModel.objects.order_by().values('status').annotate(sum_orders=Count('pk'))
+        OrderStatusCount.objects.bulk_create(OrderStatusCount(
+            status=row['status'], count=row['sum_orders'],
+        ) for row in statuses)
@@ -0,0 +1,98 @@
+import threading
+
+from django.db import IntegrityError, models, transaction
+from django.utils.translation import gettext_lazy as _
+
+
+class SequenceManager(models.Manager):
+    def allocate(self, name, count=1, initial=0):
+        """
+        Atomically increase the sequence of the given name by ``count`` and return the first one
+        of the allocated values.
+
+        :param initial: The value the sequence starts after, if it does not exist yet. This may be
+            a callable, which then is invoked only while creating the sequence.
+        """
+        with transaction.atomic(using=self.db):
+            if not self.filter(name=name).update(value=models.F('value') + count):
+                if callable(initial):
+                    initial = initial()
+                try:
+                    with transaction.atomic(using=self.db):
+                        self.create(name=name, value=initial + count)
+                except IntegrityError:
+                    # the sequence has been created concurrently by another process
+                    self.filter(name=name).update(value=models.F('value') + count)
+            value = self.filter(name=name).values_list('value', flat=True).get()
+        return value - count + 1
+
+
+class Sequence(models.Model):
+    """
+    A named counter, used to allocate unique numbers, for instance for orders and customers.
+    In comparison to computing the maximum of the numbers already assigned, it is incremented
+    atomically, hence neither its costs grow with the number of rows, nor can the same number
+    be assigned twice to concurrent requests.
+    """
+    name = models.CharField(
+        _("Name"),
+        max_length=100,
+        unique=True,
+    )
+
+    value = models.BigIntegerField(
+        _("Last allocated value"),
+        default=0,
+    )
+
+    objects = SequenceManager()
+
+    class Meta:
+        app_label = 'shop'
+        verbose_name = _("Sequence")
+        verbose_name_plural = _("Sequences")
+
+    def __str__(self):
+        return "{}: {}".format(self.name, self.value)
+
+
+class SequenceAllocator:
+    """
+    Hands out the values of a named sequence. If ``block_size`` is greater than one, that many values
+    are allocated at once and then handed out by the current process, without hitting the database.
+    This reduces the contention on the sequence's row, but the values may leave gaps and are not
+    assigned in chronological order anymore.
+    """
+    def __init__(self, name, block_size=1):
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next_value = self._last_value = None
+
+    def next_value(self, initial=0):
+        with self._lock:
+            if self.block_size <= 1 or transaction.get_connection().in_atomic_block:
+                # a rolled back transaction would revert the allocation of the whole block
+                return Sequence.objects.allocate(self.name, 1, initial)
+            if self._next_value is None or self._next_value > self._last_value:
+                self._next_value = Sequence.objects.allocate(self.name, self.block_size, initial)
+                self._last_value = self._next_value + self.block_size - 1
+            value = self._next_value
+            self._next_value += 1
+            return value
+
+
+_allocators = {}
+_allocators_lock = threading.Lock()
+
+
+def next_sequence_value(name, initial=0, block_size=1):
+    """
+    Returns the next value of the sequence with the given name. See :class:`SequenceAllocator`
+    for the meaning of ``block_size``.
+    """
+    with _allocators_lock:
+        allocator = _allocators.get(name)
+        if allocator is None or allocator.block_size != block_size:
+            allocator = _allocators[name] = SequenceAllocator(name, block_size)
+    return allocator.next_value(initial)
@@ -26,7 +26,14 @@ class BaseCartModifier:
     Each method accepts the HTTP ``request`` object. It shall be used to let implementations
     determine their prices, availability, taxes, discounts, etc. according to the identified
     customer, the originating country, and other request information.
+
+    A modifier, whose methods `pre_process_cart_item` and `process_cart_item` only depend on and
+    change the given cart item, shall declare itself as ``line_local``. If all modifiers
+    processing cart items are line-local, after changing one item of a cached cart, only that
+    item is repriced.
     """
+    line_local = False
+
     def __init__(self):
         assert hasattr(self, 'identifier'), "Each Cart modifier class requires a unique identifier"
 
@@ -131,3 +138,11 @@ class BaseCartModifier:
         This allows to add an additional row description to the cart.
         This method optionally utilizes `cart.subtotal` and/or modifies the amount in `cart.total`.
         """
+
+    def get_cache_vary_key(self, cart, request):
+        """
+        Hook to return a string identifying anything else than the cart's content, the
+        computation of this modifier depends on, for instance the customer's group, the country
+        or the language. It becomes part of the key used to cache the computed cart across
+        requests, see setting ``SHOP_CACHE_DURATIONS['computed_cart']``.
+        """
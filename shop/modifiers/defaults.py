@@ -14,14 +14,13 @@ class DefaultCartModifier(BaseCartModifier):
     entry in `SHOP_CART_MODIFIERS`.
     """
     identifier = 'default'
+    line_local = True
 
     def pre_process_cart_item(self, cart, cart_item, request, raise_exception=False):
         """
         Limit the ordered quantity in the cart to the availability in the inventory.
         """
-        kwargs = {'product_code': cart_item.product_code}
-        kwargs.update(cart_item.extra)
-        availability = cart_item.product.get_availability(request, **kwargs)
+        availability = cart_item.get_availability(request)
         if cart_item.quantity > availability.quantity:
             if raise_exception:
                 raise ProductNotAvailable(cart_item.product)
@@ -1,5 +1,65 @@
 from django.core.exceptions import ImproperlyConfigured
 from shop.conf import app_settings
+from shop.modifiers.base import BaseCartModifier
+from shop.modifiers.timing import InstrumentedModifier
+
+
+class ExecutionPlan:
+    """
+    The compiled execution plan for a list of cart modifiers. For each hook method invoked while
+    updating the cart, it contains only those modifiers which actually override that method, so
+    that no-op methods inherited from :class:`shop.modifiers.base.BaseCartModifier` are not
+    dispatched for every item in the cart.
+
+    If ``instrumented`` is set, the modifiers are wrapped into proxies recording the time and
+    the number of queries spent in each of their hook methods.
+    """
+    hooks = {
+        'arrange_watch_items': [],
+        'arrange_cart_items': [],
+        'pre_process_cart': [],
+        'pre_process_cart_item': [],
+        'process_cart_item': ['add_extra_cart_item_row'],
+        'post_process_cart_item': [],
+        'process_cart': ['add_extra_cart_row'],
+        'post_process_cart': [],
+        'get_cache_vary_key': [],
+    }
+
+    def __init__(self, modifiers, instrumented=False):
+        self.instrumented = instrumented
+        self.modifiers = tuple(InstrumentedModifier(m) if instrumented else m for m in modifiers)
+        self._modifiers_by_hooks = {}
+        for hook, delegates in self.hooks.items():
+            self._modifiers_by_hooks[(hook,)] = tuple(
+                m for m in self.modifiers if any(self.overrides(m, h) for h in [hook] + delegates)
+            )
+
+    def __getitem__(self, hook):
+        return self.get(hook)
+
+    @classmethod
+    def overrides(cls, modifier, hook):
+        if isinstance(modifier, InstrumentedModifier):
+            modifier = modifier.modifier
+        return getattr(type(modifier), hook) is not getattr(BaseCartModifier, hook)
+
+    def is_line_local(self):
+        """
+        Returns ``True`` if all modifiers processing cart items, declare themselves as line-local.
+        """
+        return all(m.line_local for m in self.get('pre_process_cart_item', 'process_cart_item'))
+
+    def get(self, *hooks):
+        """
+        Returns the modifiers, in the order of their configuration, which override at least one
+        of the given hook methods.
+        """
+        if hooks not in self._modifiers_by_hooks:
+            self._modifiers_by_hooks[hooks] = tuple(
+                m for m in self.modifiers if any(m in self.get(hook) for hook in hooks)
+            )
+        return self._modifiers_by_hooks[hooks]
 
 
 class CartModifiersPool:
@@ -8,6 +68,7 @@ class CartModifiersPool:
 
     def __init__(self):
         self._modifiers_list = []
+        self._execution_plan = None
 
     def get_all_modifiers(self):
         """
@@ -29,8 +90,19 @@ class CartModifiersPool:
             for i in identifiers:
                 if identifiers.count(i) > 1:
                     raise ModifierException
+            self._execution_plan = None
         return self._modifiers_list
 
+    def get_execution_plan(self):
+        """
+        Returns the compiled :class:`ExecutionPlan` for all registered modifiers of this shop
+        instance.
+        """
+        modifiers = self.get_all_modifiers()
+        if self._execution_plan is None:
+            self._execution_plan = ExecutionPlan(modifiers, instrumented=bool(app_settings.CART_MODIFIERS_TIMING))
+        return self._execution_plan
+
     def get_shipping_modifiers(self):
         """
         Returns all registered shipping modifiers of this shop instance.
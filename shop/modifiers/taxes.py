@@ -34,6 +34,7 @@ class CartExcludedTaxModifier(BaseCartModifier):
     and that the tax is calculated per cart but not added to the cart.
     """
     identifier = 'taxes'
+    line_local = True
     taxes = 1 - 1 / (1 + app_settings.VALUE_ADDED_TAX / 100)
 
     def add_extra_cart_row(self, cart, request):
@@ -0,0 +1,99 @@
+import time
+from collections import OrderedDict
+
+from django.db import connection
+
+
+class ModifierTiming:
+    """
+    The accumulated wall time, number of database queries and number of calls, spent by one
+    cart modifier in one of its hook methods.
+    """
+    def __init__(self):
+        self.duration = 0.0
+        self.num_queries = 0
+        self.calls = 0
+
+    def __repr__(self):
+        return "<{} duration={:.3f}ms queries={} calls={}>".format(
+            self.__class__.__name__, 1000 * self.duration, self.num_queries, self.calls)
+
+
+class InstrumentedModifier:
+    """
+    Proxy for a cart modifier, recording the wall time and number of database queries spent in each
+    of its hook methods. It is used by the execution plan only, if ``SHOP_CART_MODIFIERS_TIMING``
+    is set, otherwise the modifiers are invoked directly.
+
+    The timings are accumulated per request, keyed by the modifier's ``identifier`` and the name
+    of the hook method, ie. the stage of the cart's pipeline.
+    """
+    # position of the request in the arguments passed to each hook method
+    request_positions = {
+        'arrange_watch_items': 1,
+        'arrange_cart_items': 1,
+        'pre_process_cart': 1,
+        'pre_process_cart_item': 2,
+        'process_cart_item': 1,
+        'post_process_cart_item': 2,
+        'process_cart': 1,
+        'post_process_cart': 1,
+        'get_cache_vary_key': 1,
+    }
+
+    def __init__(self, modifier):
+        self.modifier = modifier
+
+    def __getattr__(self, name):
+        attr = getattr(self.modifier, name)
+        if name in self.request_positions:
+            def invoke(*args, **kwargs):
+                request = args[self.request_positions[name]] if len(args) > self.request_positions[name] \
+                    else kwargs['request']
+                return self.invoke(request, name, attr, *args, **kwargs)
+            return invoke
+        return attr
+
+    def __repr__(self):
+        return "<{} {!r}>".format(self.__class__.__name__, self.modifier)
+
+    def invoke(self, request, stage, method, *args, **kwargs):
+        timing = get_timings(request).setdefault((self.modifier.identifier, stage), ModifierTiming())
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(count_queries):
+                return method(*args, **kwargs)
+        finally:
+            timing.duration += time.perf_counter() - start
+            timing.num_queries += len(queries)
+            timing.calls += 1
+
+
+def get_timings(request):
+    """
+    Returns the dictionary of :class:`ModifierTiming` objects recorded while handling the given
+    request, keyed by tuples of the modifier's identifier and the stage.
+    """
+    request = getattr(request, '_request', request)  # unwrap a DRF request
+    try:
+        return request._cart_modifier_timings
+    except AttributeError:
+        request._cart_modifier_timings = OrderedDict()
+        return request._cart_modifier_timings
+
+
+def get_server_timing(timings):
+    """
+    Render the given timings as value for the HTTP header ``Server-Timing``.
+    """
+    metrics = []
+    for (identifier, stage), timing in timings.items():
+        metrics.append('{0}.{1};dur={2:.3f};desc="{3} queries, {4} calls"'.format(
+            identifier, stage, 1000 * timing.duration, timing.num_queries, timing.calls))
+    return ', '.join(metrics)
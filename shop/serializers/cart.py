@@ -29,6 +29,40 @@ class ExtraCartRowList(serializers.Serializer):
         return [dict(ecr.data, modifier=modifier) for modifier, ecr in obj.items()]
 
 
+class ProductRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    Resolve the product referred by a cart item. If many items are validated together, the products
+    prefetched by :class:`CartItemListSerializer` are used, rather than querying them one by one.
+    """
+    def to_internal_value(self, data):
+        prefetched_products = getattr(self.root, 'prefetched_products', {})
+        if str(data) in prefetched_products:
+            return prefetched_products[str(data)]
+        return super().to_internal_value(data)
+
+
+class CartItemListSerializer(serializers.ListSerializer):
+    """
+    Validate a list of items to be added to the cart together. All referred products are resolved
+    using one query and all items are added to the cart within one transaction, touching the cart
+    only once.
+    """
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            queryset = self.child.fields['product'].get_queryset()
+            product_ids = [item['product'] for item in data if isinstance(item, dict) and 'product' in item]
+            try:
+                products = queryset.in_bulk(product_ids)
+            except (TypeError, ValueError):
+                products = {}
+            self.prefetched_products = {str(pk): product for pk, product in products.items()}
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        cart = CartModel.objects.get_or_create_from_request(self.context['request'])
+        return CartItemModel.objects.add_items(cart, validated_data)
+
+
 class BaseItemSerializer(serializers.ModelSerializer):
     url = serializers.HyperlinkedIdentityField(lookup_field='pk', view_name='shop:cart-detail')
     unit_price = MoneyField()
@@ -43,7 +77,6 @@ class BaseItemSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         assert 'cart' in validated_data
         cart_item, _ = CartItemModel.objects.get_or_create(**validated_data)
-        cart_item.save()
         return cart_item
 
     def to_representation(self, cart_item):
@@ -65,8 +98,11 @@ class BaseItemSerializer(serializers.ModelSerializer):
 
 
 class CartItemSerializer(BaseItemSerializer):
+    serializer_related_field = ProductRelatedField
+
     class Meta(BaseItemSerializer.Meta):
         exclude = ['cart', 'id']
+        list_serializer_class = CartItemListSerializer
 
     def create(self, validated_data):
         validated_data['cart'] = CartModel.objects.get_or_create_from_request(self.context['request'])
@@ -122,10 +158,14 @@ class CartSerializer(BaseCartSerializer):
         super().__init__(*args, **kwargs)
 
     def represent_items(self, cart):
+        # reuse the items computed while updating the cart, rather than computing them again
+        computed_items = cart._cached_cart_items or []
         if self.with_items == CartItems.unsorted:
             items = CartItemModel.objects.filter(cart=cart, quantity__gt=0).order_by('-updated_at')
+            computed_items = {item.pk: item for item in computed_items}
+            items = [computed_items.get(item.pk, item) for item in items]
         else:
-            items = CartItemModel.objects.filter_cart_items(cart, self.context['request'])
+            items = computed_items or CartItemModel.objects.filter_cart_items(cart, self.context['request'])
         serializer = CartItemSerializer(items, context=self.context, label=self.label, many=True)
         return serializer.data
 
@@ -2,9 +2,10 @@ from django.utils import timezone
 from rest_framework import serializers
 from shop.conf import app_settings
 from shop.models.cart import CartModel
-from shop.models.order import OrderModel
+from shop.models.order import OrderModel, OrderPayment
 from shop.modifiers.pool import cart_modifiers_pool
 from shop.rest.money import MoneyField
+from shop.serializers.bases import BaseOrderItemSerializer
 
 
 class OrderListSerializer(serializers.ModelSerializer):
@@ -32,6 +33,14 @@ class OrderListSerializer(serializers.ModelSerializer):
                   'shipping_address_text', 'billing_address_text']  # TODO: these fields are not part of the base model
         read_only_fields = ['shipping_address_text', 'billing_address_text']
 
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        """
+        Prefetch and annotate the given queryset of orders with the data required by this
+        serializer, so that serializing an order does not require further queries.
+        """
+        return queryset
+
 
 class OrderDetailSerializer(OrderListSerializer):
     items = app_settings.ORDER_ITEM_SERIALIZER(
@@ -70,9 +79,14 @@ class OrderDetailSerializer(OrderListSerializer):
 
     class Meta:
         model = OrderModel
-        exclude = ['id', 'customer', 'stored_request', '_subtotal', '_total']
+        exclude = ['id', 'customer', 'stored_request', '_subtotal', '_total', '_amount_paid', '_unfulfilled_quantity']
         read_only_fields = ['shipping_address_text', 'billing_address_text']  # TODO: not part of OrderBase
 
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        queryset = super().prepare_queryset(queryset)
+        return queryset.prefetch_related('items__product')
+
     def get_partially_paid(self, order):
         return order.amount_paid > 0
 
@@ -99,3 +113,44 @@ class OrderDetailSerializer(OrderListSerializer):
             order.cancel_order()
             order.save(with_notification=True)
         return order
+
+
+class OrderItemExportSerializer(BaseOrderItemSerializer):
+    class Meta(BaseOrderItemSerializer.Meta):
+        fields = ['product_name', 'product_code', 'unit_price', 'line_total', 'quantity', 'extra']
+
+
+class OrderPaymentSerializer(serializers.ModelSerializer):
+    amount = MoneyField()
+
+    class Meta:
+        model = OrderPayment
+        fields = ['amount', 'transaction_id', 'payment_method', 'created_at']
+
+
+class OrderExportSerializer(OrderDetailSerializer):
+    """
+    Serializer used by ``./manage.py shop export-orders``. Additionally to the fields of the detail
+    serializer, it contains the customer and the payments. Its items are rendered without product
+    summaries, since these require a request.
+    """
+    customer = app_settings.CUSTOMER_SERIALIZER(read_only=True)
+
+    items = OrderItemExportSerializer(
+        many=True,
+        read_only=True,
+    )
+
+    payments = OrderPaymentSerializer(
+        source='orderpayment_set',
+        many=True,
+        read_only=True,
+    )
+
+    class Meta(OrderDetailSerializer.Meta):
+        exclude = ['id', 'stored_request', '_subtotal', '_total', '_amount_paid', '_unfulfilled_quantity']
+
+    @classmethod
+    def prepare_queryset(cls, queryset):
+        queryset = super().prepare_queryset(queryset)
+        return queryset.select_related('customer__user').prefetch_related('orderpayment_set')
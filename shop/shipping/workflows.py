@@ -1,6 +1,4 @@
-from django.db.models import Sum
 from django.utils import timezone
-from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from django_fsm import transition
 from shop.models.delivery import DeliveryModel, DeliveryItemModel
@@ -131,14 +129,9 @@ class PartialDeliveryWorkflowMixin(CommissionGoodsWorkflowMixin):
     def allow_partial_delivery(self):
         return True
 
-    @cached_property
+    @property
     def unfulfilled_items(self):
-        unfulfilled_items = 0
-        for order_item in self.items.all():
-            if not order_item.canceled:
-                aggr = order_item.deliver_item.aggregate(delivered=Sum('quantity'))
-                unfulfilled_items += order_item.quantity - (aggr['delivered'] or 0)
-        return unfulfilled_items
+        return self.unfulfilled_quantity
 
     def ready_for_picking(self):
         return self.is_fully_paid() and self.unfulfilled_items > 0
@@ -189,3 +182,4 @@ class PartialDeliveryWorkflowMixin(CommissionGoodsWorkflowMixin):
         if not delivery.items.exists():
             # since no OrderItem was added to this delivery, discard it
             delivery.delete()
+        self.refresh_from_db(fields=['_unfulfilled_quantity'])
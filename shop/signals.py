@@ -1,13 +1,20 @@
+import threading
+import time
+
 try:
     import redis
 except ImportError:
     redis = None
 from django.conf import settings
+from django.db import transaction
 from django.dispatch import Signal
+from shop.conf import app_settings
 
 
 customer_recognized = Signal(providing_args=['customer', 'request'])
 
+emails_announced = Signal(providing_args=['num_emails'])
+
 if redis and hasattr(settings, 'SESSION_REDIS'):
     redis_con = dict((key, settings.SESSION_REDIS[key]) for key in ['host', 'port', 'db', 'socket_timeout'])
     pool = redis.ConnectionPool(**redis_con)
@@ -16,10 +23,81 @@ else:
     redis_con = type(str('Redis'), (), {'publish': lambda *args: None})()
 
 
-def email_queued():
+class EmailAnnouncer:
+    """
+    Publishes the announcement of queued emails at most once per debounce window, as configured by
+    ``settings.SHOP_EMAIL_QUEUED_DEBOUNCE``. Emails queued within that window, are announced by
+    a timer, when it elapsed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timer = None
+        self.num_emails = 0
+        self.published_at = None
+
+    def announce(self, num_emails):
+        with self._lock:
+            self.num_emails += num_emails
+            if self._timer:
+                return
+            if self.published_at is not None:
+                delay = self.published_at + app_settings.SHOP_EMAIL_QUEUED_DEBOUNCE - time.monotonic()
+                if delay > 0:
+                    self._timer = threading.Timer(delay, self.publish)
+                    self._timer.daemon = True
+                    self._timer.start()
+                    return
+        self.publish()
+
+    def publish(self):
+        with self._lock:
+            num_emails, self.num_emails = self.num_emails, 0
+            self._timer = None
+            self.published_at = time.monotonic()
+        if num_emails:
+            redis_con.publish('django-SHOP', 'send_queued_mail')
+            emails_announced.send(sender=self.__class__, num_emails=num_emails)
+
+
+class PendingAnnouncement:
+    """
+    Accumulates the number of emails queued within a transaction. It is registered on commit for
+    each of them, but announces them all at once, when being invoked first.
+    """
+    def __init__(self):
+        self.num_emails = 0
+        self.committed = False
+
+    def __call__(self):
+        if not self.committed:
+            self.committed = True
+            announcer.announce(self.num_emails)
+
+
+announcer = EmailAnnouncer()
+
+_pending = threading.local()
+
+
+def email_queued(num_emails=1):
     """
     If SESSION_REDIS is configured, inform a separately running worker engine, that
-    emails are ready for delivery. Call this function every time an email has been
+    emails are ready for delivery. Call this function every time emails have been
     handled over to the Post-Office.
+
+    Within a transaction, the announcement is deferred until it commits, so that all emails
+    queued by that transaction are announced once. The signal ``emails_announced`` is sent after
+    each announcement, reporting the number of emails. Emails queued by a transaction which has
+    been rolled back, are not announced by themselves, but may be counted by the next announcement
+    of a transaction.
     """
-    redis_con.publish('django-SHOP', 'send_queued_mail')
+    if not transaction.get_connection().in_atomic_block:
+        # no transaction is open, hence a pending announcement not committed has been rolled back
+        _pending.announcement = None
+        announcer.announce(num_emails)
+        return
+    pending = getattr(_pending, 'announcement', None)
+    if pending is None or pending.committed:
+        pending = _pending.announcement = PendingAnnouncement()
+    pending.num_emails += num_emails
+    transaction.on_commit(pending)
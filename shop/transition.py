@@ -1,17 +1,21 @@
+import logging
 from urllib.parse import urlparse
 
 from django.contrib.auth.models import AnonymousUser
-from django.db import models
+from django.db import models, transaction
 from django.http.request import HttpRequest
 from post_office import mail
-from post_office.models import EmailTemplate
+from post_office.models import PRIORITY
+from post_office.utils import parse_priority
 from shop.conf import app_settings
-from shop.models.order import BaseOrder
-from shop.models.notification import Notification
+from shop.models.order import BaseOrder, OrderModel
+from shop.models.notification import Notification, QueuedNotification
 from shop.serializers.delivery import DeliverySerializer
 from shop.serializers.order import OrderDetailSerializer
 from shop.signals import email_queued
 
+logger = logging.getLogger('shop.transition')
+
 
 class EmulateHttpRequest(HttpRequest):
     """
@@ -41,41 +45,108 @@ def transition_change_notification(order):
     """
     This function shall be called, after an Order object performed a transition change.
 
+    If ``settings.SHOP_NOTIFICATION_QUEUE`` is set, the notifications are not sent immediately.
+    Instead the order and its new status are added to a queue within the current transaction,
+    to be consumed by :func:`dispatch_queued_notifications`.
     """
     if not isinstance(order, BaseOrder):
         raise TypeError("Object order must inherit from class BaseOrder")
-    emails_in_queue = False
-    for notification in Notification.objects.filter(transition_target=order.status):
+    if app_settings.SHOP_NOTIFICATION_QUEUE:
+        if Notification.objects.get_for_transition(order.status):
+            QueuedNotification.objects.create(order_id=order.pk, transition_target=order.status)
+        return
+    num_emails = send_transition_notifications(order, order.status)
+    if num_emails:
+        email_queued(num_emails)
+
+
+def get_notification_context(order):
+    """
+    Returns the context used to render the emails for all notifications of the given order, and
+    the context used to render its serializers.
+    """
+    # emulate a request object which behaves similar to that one, when the customer submitted its order
+    emulated_request = EmulateHttpRequest(order.customer, order.stored_request)
+    customer_serializer = app_settings.CUSTOMER_SERIALIZER(order.customer)
+    render_context = {'request': emulated_request, 'render_label': 'email'}
+    order_serializer = OrderDetailSerializer(order, context=render_context)
+    context = {
+        'customer': customer_serializer.data,
+        'order': order_serializer.data,
+        'ABSOLUTE_BASE_URI': emulated_request.build_absolute_uri().rstrip('/'),
+        'render_language': order.stored_request.get('language'),
+    }
+    try:
+        latest_delivery = order.delivery_set.latest()
+        context['latest_delivery'] = DeliverySerializer(latest_delivery, context=render_context).data
+    except (AttributeError, models.ObjectDoesNotExist):
+        pass
+    return context
+
+
+def send_transition_notifications(order, transition_target):
+    """
+    Render the emails for all notifications of the given transition target and hand them over
+    to the Post-Office. The order is serialized only once and shared by all its recipients.
+
+    Shared attachments are added after handing over an email. Therefore emails with attachments are
+    queued first and dispatched afterwards, if the Post-Office is configured to send them immediately.
+
+    :returns: The number of queued emails.
+    """
+    context = None
+    num_emails = 0
+    immediate = parse_priority(None) == PRIORITY.now
+    for notification in Notification.objects.get_for_transition(transition_target):
         recipient = notification.get_recipient(order)
         if recipient is None:
             continue
+        if context is None:
+            context = get_notification_context(order)
+        language = context['render_language']
+        template = notification.get_mail_template(language)
+        attachments = [notiatt.get_email_attachment() for notiatt in notification.notificationattachment_set.all()]
+        attachments = [attachment for attachment in attachments if attachment]
+        # an email with priority ``now`` would be sent before its attachments have been added
+        priority = PRIORITY.high if immediate and attachments else None
+        email = mail.send(recipient, template=template, context=context, render_on_delivery=True, priority=priority)
+        email.attachments.add(*attachments)
+        if priority is not None:
+            email.dispatch()
+        num_emails += 1
+    return num_emails
+
 
-        # emulate a request object which behaves similar to that one, when the customer submitted its order
-        emulated_request = EmulateHttpRequest(order.customer, order.stored_request)
-        customer_serializer = app_settings.CUSTOMER_SERIALIZER(order.customer)
-        render_context = {'request': emulated_request, 'render_label': 'email'}
-        order_serializer = OrderDetailSerializer(order, context=render_context)
-        language = order.stored_request.get('language')
-        context = {
-            'customer': customer_serializer.data,
-            'order': order_serializer.data,
-            'ABSOLUTE_BASE_URI': emulated_request.build_absolute_uri().rstrip('/'),
-            'render_language': language,
-        }
-        try:
-            latest_delivery = order.delivery_set.latest()
-            context['latest_delivery'] = DeliverySerializer(latest_delivery, context=render_context).data
-        except (AttributeError, models.ObjectDoesNotExist):
-            pass
-        try:
-            template = notification.mail_template.translated_templates.get(language=language)
-        except EmailTemplate.DoesNotExist:
-            template = notification.mail_template
-        attachments = {}
-        for notiatt in notification.notificationattachment_set.all():
-            attachments[notiatt.attachment.original_filename] = notiatt.attachment.file.file
-        mail.send(recipient, template=template, context=context,
-                  attachments=attachments, render_on_delivery=True)
-        emails_in_queue = True
-    if emails_in_queue:
-        email_queued()
+def dispatch_queued_notifications(batch_size=100):
+    """
+    Consume the queue filled by :func:`transition_change_notification`, sending the notifications
+    for each queued order transition. The orders of each batch are fetched using one query.
+
+    An order transition whose notifications can not be sent, is logged and removed from the queue,
+    so that it neither rolls back the other transitions of its batch, nor blocks the queue.
+
+    :returns: The number of dispatched order transitions.
+    """
+    num_dispatched = num_emails = 0
+    while True:
+        with transaction.atomic():
+            queued = list(QueuedNotification.objects.select_for_update(skip_locked=True)[:batch_size])
+            if not queued:
+                break
+            orders = OrderModel.objects.filter(pk__in={entry.order_id for entry in queued})
+            orders = OrderDetailSerializer.prepare_queryset(orders.select_related('customer__user')).in_bulk()
+            for entry in queued:
+                if entry.order_id not in orders:
+                    continue
+                try:
+                    with transaction.atomic():
+                        num_emails += send_transition_notifications(orders[entry.order_id], entry.transition_target)
+                except Exception:
+                    logger.exception("Failed to send the notifications of order %s for transition to '%s'.",
+                                     entry.order_id, entry.transition_target)
+                else:
+                    num_dispatched += 1
+            QueuedNotification.objects.filter(pk__in=[entry.pk for entry in queued]).delete()
+    if num_emails:
+        email_queued(num_emails)
+    return num_dispatched
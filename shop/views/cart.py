@@ -2,7 +2,9 @@ from django.utils.cache import add_never_cache_headers
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from shop.conf import app_settings
 from shop.models.cart import CartModel, CartItemModel
+from shop.modifiers.timing import get_timings, get_server_timing
 from shop.serializers.cart import CartSerializer, CartItemSerializer, WatchSerializer, WatchItemSerializer, CartItems
 
 
@@ -77,6 +79,10 @@ class BaseViewSet(viewsets.ModelViewSet):
         """Set HTTP headers to not cache this view"""
         if self.action != 'render_product_summary':
             add_never_cache_headers(response)
+        if app_settings.CART_MODIFIERS_TIMING == 'server-timing':
+            timings = get_timings(request)
+            if timings:
+                response['Server-Timing'] = get_server_timing(timings)
         return super().finalize_response(request, response, *args, **kwargs)
 
 
@@ -92,6 +98,23 @@ class CartViewSet(BaseViewSet):
         serializer = self.serializer_class(cart, context=context, with_items=CartItems.without)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'], url_path='add-items')
+    def add_items(self, request):
+        """
+        Add a list of items to the cart, each one referring to a product, optionally with its
+        product code, quantity and extra information. All items are validated together and added
+        within one transaction. Afterwards the cart is repriced once and returned.
+        """
+        context = self.get_serializer_context()
+        item_serializer = self.item_serializer_class(context=context, data=request.data, many=True,
+                                                     label=self.serializer_label)
+        item_serializer.is_valid(raise_exception=True)
+        self.perform_create(item_serializer)
+        cart = CartModel.objects.get_from_request(request)
+        cart_serializer = self.serializer_class(cart, context=context, label=self.serializer_label,
+                                                with_items=self.with_items)
+        return Response(cart_serializer.data, status=status.HTTP_201_CREATED)
+
     @action(detail=False, methods=['get'], url_path='fetch-dropdown')
     def fetch_dropdown(self, request):
         cart = self.get_queryset()
@@ -113,7 +113,7 @@ class CheckoutViewSet(GenericViewSet):
         """
         cart = CartModel.objects.get_from_request(request)
         try:
-            cart.update(request, raise_exception=True)
+            cart.update(request, raise_exception=True, use_cache=False)
         except ProductNotAvailable as exc:
             message = _("The product '{product_name}' ({product_code}) suddenly became unavailable, "\
                         "presumably because someone else has been faster purchasing it.\n Please "\
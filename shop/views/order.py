@@ -1,16 +1,19 @@
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.views.decorators.cache import never_cache
 from django.utils.translation import gettext_lazy as _
 from rest_framework import generics, mixins
 from rest_framework.exceptions import NotFound, MethodNotAllowed
-from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
 from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import BasePermission
+from shop.conf import app_settings
 from shop.rest.money import JSONRenderer
 from shop.rest.renderers import CMSPageRenderer
 from shop.serializers.order import OrderListSerializer, OrderDetailSerializer
-from shop.models.order import OrderModel
+from shop.models.order import ArchivedOrder, OrderModel
 
 
 class OrderPagination(LimitOffsetPagination):
@@ -18,6 +21,17 @@ class OrderPagination(LimitOffsetPagination):
     template = 'shop/templatetags/paginator.html'
 
 
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination for the list of orders, ordered by their creation date and primary key.
+    In comparison to :class:`OrderPagination`, deep pages of a long order history neither require
+    an OFFSET scan nor a COUNT over all orders of the customer.
+    """
+    page_size = 15
+    ordering = ['-created_at', '-pk']
+    template = 'shop/templatetags/paginator.html'
+
+
 class OrderPermission(BasePermission):
     """
     Allow access to a given Order if the user is entitled to.
@@ -55,7 +69,39 @@ class OrderView(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.UpdateM
         queryset = OrderModel.objects.all()
         if not self.request.customer.is_visitor:
             queryset = queryset.filter(customer=self.request.customer).order_by('-updated_at')
-        return queryset
+        prepare_queryset = getattr(self.get_serializer_class(), 'prepare_queryset', None)
+        return prepare_queryset(queryset) if prepare_queryset else queryset
+
+    def get_object(self):
+        # the detail view accesses its order multiple times, fetch it only once
+        if not hasattr(self, '_object'):
+            try:
+                self._object = super().get_object()
+            except Http404:
+                self._object = self.get_archived_object()
+        return self._object
+
+    def get_archived_object(self):
+        """
+        Rehydrate the requested order from the archive, in case it has been moved there.
+        """
+        queryset = ArchivedOrder.objects.all()
+        if not self.request.customer.is_visitor:
+            queryset = queryset.filter(customer=self.request.customer)
+        archived_order = get_object_or_404(queryset, number=self.kwargs[self.lookup_url_kwarg])
+        order = archived_order.rehydrate()
+        self.check_object_permissions(self.request, order)
+        return order
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            pagination_class = self.pagination_class
+            if pagination_class is OrderPagination:
+                # the default pagination may be replaced through ``settings.SHOP_ORDER_PAGINATION``
+                pagination_class = app_settings.ORDER_PAGINATION
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
 
     def get_serializer_class(self):
         if self.many:
@@ -82,7 +128,9 @@ class OrderView(mixins.ListModelMixin, mixins.RetrieveModelMixin, mixins.UpdateM
         assert self.many is False, "This method can be called for detail views only"
         lapse = timezone.now() - self.last_order_lapse
         current_order = self.get_object()
-        last_order = self.get_queryset().first()
+        last_order = self.get_queryset().prefetch_related(None).first()
+        if last_order is None:
+            return False
         return current_order.id == last_order.id and current_order.created_at > lapse
 
     @property
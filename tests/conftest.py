@@ -28,6 +28,13 @@ def session():
     return session
 
 
+@pytest.fixture(autouse=True)
+def notification_index():
+    yield
+    # rolling back the test's transaction does not send any signal invalidating the index
+    Notification.objects.invalidate_index()
+
+
 @pytest.fixture
 def api_client():
     api_client = APIClient()
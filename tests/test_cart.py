@@ -1,9 +1,15 @@
 import pytest
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.messages.storage import default_storage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from shop.conf import app_settings
-from shop.models.cart import CartModel
+from shop.models import cart as cart_module
+from shop.models.cart import BaseCartItem, CartModel, CartItemModel
 from shop.models.defaults.customer import Customer
+from shop.models.product import Availability, AvailableProductMixin, BaseProduct, ReserveProductMixin
+from shop.modifiers.defaults import DefaultCartModifier
 from shop.modifiers.pool import CartModifiersPool
 from shop.views.cart import CartViewSet, WatchViewSet
 from shop.modifiers.pool import cart_modifiers_pool
@@ -39,6 +45,60 @@ def test_add_to_cart(commodity_factory, api_client, rf):
     return filled_cart
 
 
+@pytest.mark.django_db
+def test_add_items_to_cart(commodity_factory, api_client):
+    product1, product2 = commodity_factory(), commodity_factory()
+    data = [
+        {'product': product1.id, 'quantity': 2},
+        {'product': product2.id, 'product_code': product2.product_code, 'quantity': 1, 'extra': {'note': "gift"}},
+        {'product': product1.id, 'quantity': 1},
+    ]
+    with CaptureQueriesContext(connection) as queries:
+        response = api_client.post(reverse('shop:cart-add-items'), data, format='json')
+    assert response.status_code == 201
+    cart_table = '"{}"'.format(CartModel._meta.db_table)
+    # the cart is touched once, rather than for each item
+    assert len([q for q in queries if q['sql'].startswith('UPDATE ' + cart_table)]) == 1
+    cart = CartModel.objects.get()
+    assert (cart.num_items, cart.total_quantity) == (2, 4)
+    assert response.data['num_items'] == 2
+    assert response.data['total_quantity'] == 4
+    assert response.data['subtotal'] == str(3 * product1.unit_price + product2.unit_price)
+    quantities = {item['summary']['id']: item['quantity'] for item in response.data['items']}
+    assert quantities == {product1.id: 3, product2.id: 1}
+
+    data = [{'product': product1.id, 'quantity': 1}, {'product': 0, 'quantity': 1}]
+    response = api_client.post(reverse('shop:cart-add-items'), data, format='json')
+    assert response.status_code == 400
+    assert response.data[0] == {}
+    assert 'product' in response.data[1]
+
+
+@pytest.mark.django_db
+def test_add_items_with_customized_save(monkeypatch, commodity_factory, api_client):
+    saved = []
+
+    def save(cart_item, *args, **kwargs):
+        saved.append(cart_item.product_id)
+        BaseCartItem.save(cart_item, *args, **kwargs)
+
+    monkeypatch.setattr(CartItemModel, 'save', save, raising=False)
+    product1, product2 = commodity_factory(), commodity_factory()
+    data = [
+        {'product': product1.id, 'quantity': 2},
+        {'product': product2.id, 'quantity': 1},
+        {'product': product1.id, 'quantity': 1},
+    ]
+    response = api_client.post(reverse('shop:cart-add-items'), data, format='json')
+    assert response.status_code == 201
+    # the overridden save method is invoked for each newly created item
+    assert saved == [product1.id, product2.id]
+    cart = CartModel.objects.get()
+    assert (cart.num_items, cart.total_quantity) == (2, 4)
+    assert response.data['num_items'] == 2
+    assert response.data['total_quantity'] == 4
+
+
 @pytest.mark.django_db
 def test_list_cart(api_rf, filled_cart):
     request = api_rf.get('/shop/api/cart')
@@ -145,3 +205,276 @@ def test_payment_modifiers_with_same_processors(api_rf, filled_cart):
         for modifier_for_id in cart_modifiers_pool.get_payment_modifiers():
             if modifier_to_test.is_active(modifier_for_id.identifier):
                 assert modifier_for_id.identifier == modifier_to_test.identifier
+
+
+@pytest.mark.django_db
+def test_prefetch_cart_items(rf, empty_cart, commodity_factory, django_assert_num_queries):
+    for quantity in range(1, 4):
+        CartItemModel.objects.get_or_create(cart=empty_cart, product=commodity_factory(), quantity=quantity)
+    request = rf.get('/my-cart')
+    request.customer = empty_cart.customer
+    items = list(CartItemModel.objects.filter(cart=empty_cart))
+    CartItemModel.objects.prefetch_cart_items(items, request)
+    with django_assert_num_queries(0):
+        for item in items:
+            assert item.get_availability(request).quantity == item.product.quantity
+
+
+@pytest.mark.django_db
+def test_prefetch_overridden_availability(monkeypatch, rf, empty_cart, commodity_factory):
+    def get_availability(self, request, **kwargs):
+        return Availability(quantity=kwargs['product_code'] == 'variant-1' and 1 or 0)
+
+    product = commodity_factory()
+    CartItemModel.objects.get_or_create(cart=empty_cart, product=product, quantity=1, product_code='variant-1')
+    request = rf.get('/my-cart')
+    request.customer = empty_cart.customer
+
+    # the product class overrides get_availability(), but inherits get_availabilities() from its mixin
+    monkeypatch.setattr(product.__class__, 'get_availability', get_availability)
+    assert CartItemModel.objects.supports_bulk_availability(product.__class__) is False
+    items = list(CartItemModel.objects.filter(cart=empty_cart))
+    CartItemModel.objects.prefetch_cart_items(items, request)
+    assert items[0].get_availability(request).quantity == 1
+
+
+def test_supports_bulk_availability():
+    class VariantProduct(AvailableProductMixin):
+        def get_availability(self, request, **kwargs):
+            return Availability()
+
+    assert CartItemModel.objects.supports_bulk_availability(BaseProduct) is True
+    assert CartItemModel.objects.supports_bulk_availability(AvailableProductMixin) is True
+    assert CartItemModel.objects.supports_bulk_availability(ReserveProductMixin) is True
+    assert CartItemModel.objects.supports_bulk_availability(VariantProduct) is False
+
+
+def test_execution_plan():
+    plan = cart_modifiers_pool.get_execution_plan()
+    assert [m.identifier for m in plan['pre_process_cart_item']] == ['default']
+    assert [m.identifier for m in plan['process_cart_item']] == ['default']
+    assert [m.identifier for m in plan['process_cart']] == ['default', 'taxes']
+    assert plan['post_process_cart'] == ()
+    assert plan.get('pre_process_cart', 'process_cart') == plan['process_cart']
+
+
+@pytest.mark.django_db
+def test_computed_cart_cache(settings, monkeypatch, rf, filled_cart):
+    def process_cart_item(self, cart_item, request):
+        raise AssertionError("Cart modifiers shall not be invoked on a cached cart")
+
+    settings.SHOP_CACHE_DURATIONS = {'computed_cart': 60}
+    request = rf.get('/my-cart')
+    request.customer = filled_cart.customer
+    cart = CartModel.objects.get(pk=filled_cart.pk)
+    cart.update(request)
+    subtotal, total = cart.subtotal, cart.total
+
+    # reading the same cart in another request, skips the modifiers
+    monkeypatch.setattr(DefaultCartModifier, 'process_cart_item', process_cart_item)
+    cart = CartModel.objects.get(pk=filled_cart.pk)
+    cart.update(request)
+    assert cart.subtotal == subtotal
+    assert cart.total == total
+    assert list(cart.extra_rows.keys()) == ['taxes']
+
+    # the checkout opts out of the cache
+    cart = CartModel.objects.get(pk=filled_cart.pk)
+    with pytest.raises(AssertionError):
+        cart.update(request, use_cache=False)
+    monkeypatch.undo()
+
+    # changing the cart invalidates the cache
+    cart_item = cart.items.first()
+    cart_item.quantity = 1
+    cart_item.save()
+    cart = CartModel.objects.get(pk=filled_cart.pk)
+    cart.update(request)
+    assert cart.subtotal == cart_item.product.unit_price
+
+
+@pytest.mark.django_db
+def test_computed_cart_cache_queries(settings, api_rf, empty_cart, commodity_factory):
+    def capture_queries():
+        request = api_rf.get('/shop/api/cart')
+        request.customer = empty_cart.customer
+        with CaptureQueriesContext(connection) as context:
+            response = CartViewSet.as_view({'get': 'list'})(request)
+        assert response.status_code == 200
+        return [query['sql'] for query in context.captured_queries]
+
+    products = [commodity_factory() for _ in range(6)]
+    for product in products:
+        CartItemModel.objects.get_or_create(cart=empty_cart, product=product, quantity=1)
+    capture_queries()  # warm up
+
+    settings.SHOP_CACHE_DURATIONS = {'computed_cart': 60}
+    queries_on_miss = capture_queries()
+    queries_on_hit = capture_queries()
+    assert len(queries_on_hit) <= len(queries_on_miss)
+
+    # the products of a cached cart are loaded in one pass, rather than item by item
+    product_table = products[0]._meta.db_table
+    assert len([sql for sql in queries_on_hit if sql.startswith('SELECT') and 'FROM "{}"'.format(product_table) in sql]) == 1
+
+
+@pytest.mark.django_db
+def test_computed_cart_cache_varies_by_language(monkeypatch, rf, filled_cart):
+    # this test project has USE_I18N disabled, hence emulate switching the language
+    request = rf.get('/my-cart')
+    request.customer = filled_cart.customer
+    vary_key = filled_cart.get_cache_vary_key(request)
+    monkeypatch.setattr(cart_module, 'get_language', lambda: 'de')
+    assert filled_cart.get_cache_vary_key(request) != vary_key
+
+
+@pytest.mark.django_db
+def test_update_without_reloading_items(rf, empty_cart, commodity_factory):
+    def count_queries():
+        cart = CartModel.objects.get(pk=empty_cart.pk)
+        with CaptureQueriesContext(connection) as context:
+            cart.update(request)
+        return len(context.captured_queries)
+
+    request = rf.get('/my-cart')
+    request.customer = empty_cart.customer
+    CartItemModel.objects.get_or_create(cart=empty_cart, product=commodity_factory(), quantity=1)
+    num_queries = count_queries()
+    for _ in range(3):
+        CartItemModel.objects.get_or_create(cart=empty_cart, product=commodity_factory(), quantity=1)
+    assert count_queries() == num_queries
+
+
+@pytest.mark.django_db
+def test_refresh_changed_cart_items(rf, filled_cart):
+    request = rf.get('/my-cart')
+    request.customer = filled_cart.customer
+    cart_item = filled_cart.items.first()
+    CartItemModel.objects.filter(pk=cart_item.pk).update(quantity=1, updated_at=timezone.now())
+    filled_cart.save()
+    filled_cart.update(request)
+    assert filled_cart.subtotal == cart_item.product.unit_price
+
+
+@pytest.mark.django_db
+def test_reprice_changed_item_only(settings, monkeypatch, rf, empty_cart, commodity_factory):
+    settings.SHOP_CACHE_DURATIONS = {'computed_cart': 60}
+    request = rf.get('/my-cart')
+    request.customer = empty_cart.customer
+    for _ in range(3):
+        CartItemModel.objects.get_or_create(cart=empty_cart, product=commodity_factory(), quantity=1)
+    cart = CartModel.objects.get(pk=empty_cart.pk)
+    cart.update(request)
+
+    repriced_items = []
+    process_cart_item = DefaultCartModifier.process_cart_item
+
+    def track_process_cart_item(self, cart_item, request):
+        repriced_items.append(cart_item.pk)
+        return process_cart_item(self, cart_item, request)
+
+    monkeypatch.setattr(DefaultCartModifier, 'process_cart_item', track_process_cart_item)
+    cart_item = cart.items.last()
+    cart_item.quantity = 3
+    cart_item.save()
+    cart = CartModel.objects.get(pk=empty_cart.pk)
+    cart.update(request)
+    assert repriced_items == [cart_item.pk]
+    assert cart.subtotal == sum(item.product.unit_price * item.quantity for item in cart.items.all())
+
+
+@pytest.mark.django_db
+def test_item_counters(empty_cart, commodity_factory, django_assert_num_queries):
+    product = commodity_factory()
+    CartItemModel.objects.get_or_create(cart=empty_cart, product=product, quantity=2)
+    CartItemModel.objects.get_or_create(cart=empty_cart, product=product, quantity=1)
+    watch_item, _ = CartItemModel.objects.get_or_create(cart=empty_cart, product=commodity_factory(), quantity=0)
+    cart = CartModel.objects.get(pk=empty_cart.pk)
+    with django_assert_num_queries(0):
+        assert cart.num_items == 1
+        assert cart.total_quantity == 3
+        assert cart.is_empty is False
+
+    watch_item.quantity = 4
+    watch_item.save()
+    assert watch_item.cart.num_items == 2
+    watch_item.delete()
+    cart.items.first().delete()
+    cart = CartModel.objects.get(pk=empty_cart.pk)
+    assert cart.is_empty
+
+    CartItemModel.objects.get_or_create(cart=cart, product=product, quantity=5)
+    CartModel.objects.filter(pk=cart.pk).update(_num_items=7, _total_quantity=0)
+    assert CartModel.objects.recount_items(pk=cart.pk) == 1
+    cart.refresh_from_db()
+    assert cart.num_items == 1
+    assert cart.total_quantity == 5
+
+
+@pytest.mark.django_db
+def test_merge_with_equality_key(monkeypatch, empty_cart, registered_customer, commodity_factory):
+    product = commodity_factory()
+    other_product = commodity_factory()
+    monkeypatch.setattr(type(product), 'get_cart_item_key',
+                        lambda self, product_code=None, extra=None: (extra or {}).get('color'))
+    CartItemModel.objects.create(cart=empty_cart, product=product, quantity=1, extra={'color': 'red'})
+    CartItemModel.objects.create(cart=empty_cart, product=other_product, quantity=0)
+    other_cart = CartModel.objects.create(customer=registered_customer)
+    CartItemModel.objects.create(cart=other_cart, product=product, quantity=2, extra={'color': 'red'})
+    CartItemModel.objects.create(cart=other_cart, product=product, quantity=3, extra={'color': 'blue'})
+    CartItemModel.objects.create(cart=other_cart, product=other_product, quantity=4)
+
+    empty_cart.merge_with(other_cart)
+    assert not CartModel.objects.filter(pk=other_cart.pk).exists()
+    quantities = {(item.product_id, item.extra.get('color')): item.quantity for item in empty_cart.items.all()}
+    assert quantities == {
+        (product.pk, 'red'): 3,
+        (product.pk, 'blue'): 3,
+        (other_product.pk, None): 4,
+    }
+    cart = CartModel.objects.get(pk=empty_cart.pk)
+    assert cart.num_items == empty_cart.num_items == 3
+    assert cart.total_quantity == empty_cart.total_quantity == 10
+
+
+@pytest.mark.django_db
+def test_add_to_cart_increments_atomically(monkeypatch, empty_cart, commodity_factory):
+    product = commodity_factory()
+    cart_item, created = CartItemModel.objects.get_or_create(cart=empty_cart, product=product, quantity=1)
+    assert created is True
+
+    # another request increased the quantity, after our lookup returned the item
+    stale_item = CartItemModel.objects.get(pk=cart_item.pk)
+    CartItemModel.objects.filter(pk=cart_item.pk).update(quantity=3)
+    monkeypatch.setattr(type(product), 'is_in_cart', lambda self, cart, watched=False, **kwargs: stale_item)
+    with CaptureQueriesContext(connection) as queries:
+        cart_item, created = CartItemModel.objects.get_or_create(cart=empty_cart, product=product, quantity=2)
+    assert created is False
+    cart_table = CartModel._meta.db_table
+    assert len([q for q in queries if q['sql'].startswith('UPDATE "{}"'.format(cart_table))]) == 1
+    cart_item.refresh_from_db()
+    assert cart_item.quantity == 5
+    assert CartModel.objects.get(pk=empty_cart.pk).num_items == 1
+
+
+@pytest.mark.django_db
+def test_modifier_timings(settings, api_rf, filled_cart):
+    assert cart_modifiers_pool.get_execution_plan().instrumented is False
+    settings.SHOP_CART_MODIFIERS_TIMING = 'server-timing'
+    assert cart_modifiers_pool.get_execution_plan().instrumented is True
+
+    request = api_rf.get('/shop/api/cart')
+    request.customer = filled_cart.customer
+    response = CartViewSet.as_view({'get': 'list'})(request)
+    assert response.status_code == 200
+    timings = request._cart_modifier_timings
+    timing = timings[('default', 'process_cart_item')]
+    assert timing.calls == 1
+    assert timing.duration > 0
+    assert ('default', 'process_cart') in timings
+    assert ('default', 'pre_process_cart') not in timings
+    assert 'default.process_cart_item;dur=' in response['Server-Timing']
+
+    cart = CartModel.objects.get(pk=filled_cart.pk)
+    cart.update(request)
+    assert cart.modifier_timings[('default', 'process_cart_item')].calls == 2
@@ -66,3 +66,21 @@ def test_limited_offer(api_rf, inventory_factory):
     assert availability.latest == latest
     assert availability.sell_short is False
     assert availability.limited_offer is True
+
+
+@pytest.mark.django_db
+def test_availabilities(api_rf, inventory_factory):
+    request = api_rf.get('/add-to-cart')
+    now = timezone.now()
+    products = [
+        inventory_factory(earliest=now - timedelta(days=1), quantity=10).product,
+        inventory_factory(earliest=now + app_settings.SHOP_SELL_SHORT_PERIOD / 2, quantity=7).product,
+        inventory_factory(earliest=now + app_settings.SHOP_SELL_SHORT_PERIOD * 2, quantity=3).product,
+    ]
+    availabilities = MyProduct.get_availabilities(products, request)
+    for product in products:
+        availability = product.get_availability(request)
+        assert availabilities[product.pk].quantity == availability.quantity
+        assert availabilities[product.pk].sell_short == availability.sell_short
+        assert availabilities[product.pk].limited_offer == availability.limited_offer
+    assert availabilities[products[2].pk].quantity == 0
@@ -0,0 +1,184 @@
+import threading
+import time
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from post_office import mail
+from post_office.connections import connections
+from post_office.mail import get_queued
+from post_office.models import Email, STATUS
+from shop import signals
+from shop.mailworker import MailWorker
+from shop.signals import EmailAnnouncer, email_queued, emails_announced, redis_con
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = []
+
+    def subscribe(self, channel):
+        self.redis.subscribers.setdefault(channel, []).append(self)
+
+    def get_message(self, timeout=0):
+        if self.messages:
+            return self.messages.pop(0)
+
+
+class FakeRedis:
+    def __init__(self):
+        self.subscribers = {}
+
+    def publish(self, channel, message):
+        for pubsub in self.subscribers.get(channel, []):
+            pubsub.messages.append({'type': 'message', 'channel': channel, 'data': message})
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return FakePubSub(self)
+
+
+@pytest.fixture
+def mail_outbox(settings, monkeypatch, tmp_path):
+    settings.POST_OFFICE = dict(settings.POST_OFFICE, BACKENDS={
+        'default': 'django.core.mail.backends.filebased.EmailBackend',
+    })
+    settings.EMAIL_FILE_PATH = str(tmp_path)
+    # the Post-Office keeps a connection per thread, which must not be reused by other tests
+    monkeypatch.setattr(connections, '_connections', threading.local())
+    return tmp_path
+
+
+def read_outbox(outbox):
+    """
+    Returns the content written through each connection of the file based email backend.
+    """
+    return [path.read_text() for path in outbox.iterdir() if path.stat().st_size]
+
+
+@pytest.mark.django_db
+def test_coalesce_announcements(mail_outbox):
+    fake_redis = FakeRedis()
+    worker = MailWorker(redis_con=fake_redis, poll_interval=0, coalesce_delay=0, threads=2)
+    worker.subscribe()
+    for k in range(6):
+        mail.send('customer{}@example.com'.format(k), subject="Order", message="Thank you")
+        fake_redis.publish('django-SHOP', 'send_queued_mail')
+
+    assert worker.wait() == 6
+    assert worker.drain() == (6, 0)
+    assert worker.wait() == 0
+    assert Email.objects.filter(status=STATUS.sent).count() == 6
+
+    # each thread reused its connection for all emails of its share
+    outbox = read_outbox(mail_outbox)
+    assert len(outbox) == 2
+    assert sorted(content.count("Subject: Order") for content in outbox) == [3, 3]
+
+
+@pytest.mark.django_db
+def test_poll_without_redis(mail_outbox):
+    worker = MailWorker(redis_con=redis_con, poll_interval=0)
+    mail.send('customer@example.com', subject="Order", message="Thank you")
+    worker.run(max_drains=1)
+    assert Email.objects.get().status == STATUS.sent
+    assert len(read_outbox(mail_outbox)) == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_claim_batch(monkeypatch, mail_outbox):
+    scheduled_time = timezone.now() - timezone.timedelta(minutes=1)
+    for k in range(3):
+        mail.send('customer{}@example.com'.format(k), subject="Order", message="Thank you")
+    Email.objects.filter(to='customer2@example.com').update(scheduled_time=scheduled_time)
+    worker = MailWorker(redis_con=redis_con, claim_timeout=60)
+
+    # claimed emails are leased, hence neither claimed by other workers nor sent by the Post-Office
+    claimed = worker.claim_batch()
+    assert len(claimed) == 3
+    assert MailWorker(redis_con=redis_con).claim_batch() == {}
+    assert not get_queued()
+    assert all(email.scheduled_time > timezone.now() for email in Email.objects.all())
+
+    # emails of a worker which terminated while sending, are claimed again after their lease expired
+    Email.objects.update(scheduled_time=timezone.now())
+    assert len(MailWorker(redis_con=redis_con).claim_batch()) == 3
+
+    # the emails are sent outside of any transaction, afterwards their scheduled time is restored
+    Email.objects.all().delete()
+    for k in range(2):
+        mail.send('customer{}@example.com'.format(k), subject="Order", message="Thank you")
+    Email.objects.filter(to='customer1@example.com').update(scheduled_time=scheduled_time)
+    in_atomic_blocks = []
+    send_batch = worker.send_batch
+
+    def send_batch_outside_transaction(emails):
+        in_atomic_blocks.append(connection.in_atomic_block)
+        return send_batch(emails)
+
+    monkeypatch.setattr(worker, 'send_batch', send_batch_outside_transaction)
+    assert worker.drain() == (2, 0)
+    assert in_atomic_blocks == [False]
+    assert set(Email.objects.values_list('status', flat=True)) == {STATUS.sent}
+    assert sorted(Email.objects.values_list('scheduled_time', flat=True), key=bool) == [None, scheduled_time]
+
+
+@pytest.mark.django_db
+def test_mailworker_command(mail_outbox):
+    mail.send('customer@example.com', subject="Order", message="Thank you")
+    stdout = StringIO()
+    call_command('shop', 'mailworker', '--once', stdout=stdout)
+    assert stdout.getvalue().strip() == "Sent 1 emails, 0 failed."
+    assert Email.objects.get().status == STATUS.sent
+
+
+@pytest.fixture
+def announcements(monkeypatch):
+    fake_redis = FakeRedis()
+    pubsub = fake_redis.pubsub()
+    pubsub.subscribe('django-SHOP')
+    monkeypatch.setattr(signals, 'redis_con', fake_redis)
+    monkeypatch.setattr(signals, 'announcer', EmailAnnouncer())
+    monkeypatch.setattr(signals, '_pending', threading.local())
+    announced = []
+
+    def receiver(num_emails, **kwargs):
+        announced.append((num_emails, len(pubsub.messages)))
+
+    emails_announced.connect(receiver)
+    yield announced
+    emails_announced.disconnect(receiver)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_email_queued_on_commit(announcements):
+    with transaction.atomic():
+        for _ in range(3):
+            email_queued()
+        email_queued(2)
+        assert announcements == []
+    assert announcements == [(5, 1)]
+
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            email_queued()
+            raise RuntimeError
+    email_queued()
+    assert announcements == [(5, 1), (1, 2)]
+
+    with transaction.atomic():
+        email_queued()
+        with transaction.atomic():
+            email_queued(2)
+    assert announcements == [(5, 1), (1, 2), (3, 3)]
+
+
+def test_email_queued_debounce(settings, announcements):
+    settings.SHOP_EMAIL_QUEUED_DEBOUNCE = 0.2
+    for _ in range(3):
+        email_queued()
+    assert announcements == [(1, 1)]
+    time.sleep(0.3)
+    assert announcements == [(1, 1), (2, 2)]
@@ -0,0 +1,164 @@
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import transaction
+from filer.models import File as FilerFile
+from post_office.models import Attachment, Email, STATUS
+from shop import transition
+from shop.models.notification import Notification, NotificationAttachment, Notify, QueuedNotification
+from shop.models.order import OrderModel
+from shop.transition import transition_change_notification
+
+
+@pytest.fixture
+def order(registered_customer):
+    return OrderModel.objects.create(
+        customer=registered_customer,
+        currency='EUR',
+        _subtotal=Decimal(0),
+        _total=Decimal(0),
+        stored_request={'language': 'en', 'absolute_base_uri': 'http://testserver/'},
+    )
+
+
+@pytest.mark.django_db
+def test_queued_notifications(settings, order, user_factory, notification_factory):
+    settings.SHOP_NOTIFICATION_QUEUE = True
+    notification_factory(transition_target='new', notify=Notify.CUSTOMER)
+    notification_factory(transition_target='new', notify=Notify.RECIPIENT,
+                         recipient=user_factory(email='staff@example.com', is_staff=True))
+    transition_change_notification(order)
+    assert list(QueuedNotification.objects.values_list('order_id', 'transition_target')) == [(order.pk, 'new')]
+    assert Email.objects.count() == 0
+
+    stdout = StringIO()
+    call_command('shop', 'notifications', stdout=stdout)
+    assert stdout.getvalue().strip() == "Sent the notifications of 1 order transitions."
+    assert QueuedNotification.objects.count() == 0
+    assert sorted(email.to[0] for email in Email.objects.all()) == [order.customer.email, 'staff@example.com']
+
+
+@pytest.mark.django_db
+def test_failing_queued_notification(settings, monkeypatch, caplog, order, notification_factory):
+    settings.SHOP_NOTIFICATION_QUEUE = True
+    notification_factory(transition_target='new', notify=Notify.CUSTOMER)
+    failing_order = OrderModel.objects.create(customer=order.customer, currency='EUR',
+                                              _subtotal=Decimal(0), _total=Decimal(0), stored_request={})
+    transition_change_notification(failing_order)
+    transition_change_notification(order)
+    send_transition_notifications = transition.send_transition_notifications
+
+    def send_or_fail(notified_order, transition_target):
+        num_emails = send_transition_notifications(notified_order, transition_target)
+        if notified_order.pk == failing_order.pk:
+            raise RuntimeError("Mail server unavailable")
+        return num_emails
+
+    monkeypatch.setattr(transition, 'send_transition_notifications', send_or_fail)
+    stdout = StringIO()
+    call_command('shop', 'notifications', stdout=stdout)
+    assert stdout.getvalue().strip() == "Sent the notifications of 1 order transitions."
+    assert "Failed to send the notifications of order {}".format(failing_order.pk) in caplog.text
+
+    # the emails of the failing transition are rolled back, while the queue is not blocked
+    assert QueuedNotification.objects.count() == 0
+    assert [email.to[0] for email in Email.objects.all()] == [order.customer.email]
+
+
+@pytest.mark.django_db
+def test_transition_without_notification(settings, order):
+    settings.SHOP_NOTIFICATION_QUEUE = True
+    transition_change_notification(order)
+    assert QueuedNotification.objects.count() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+def test_notification_index(settings, order, notification_factory, django_assert_num_queries):
+    settings.SHOP_NOTIFICATION_QUEUE = True
+    notification = notification_factory(transition_target='payment_confirmed', notify=Notify.CUSTOMER)
+    assert Notification.objects.get_for_transition('payment_confirmed') == [notification]
+    with django_assert_num_queries(0):
+        Notification.objects.get_for_transition('payment_confirmed')
+        transition_change_notification(order)
+    assert QueuedNotification.objects.count() == 0
+
+    # modifying a notification discards the index, after the change has been committed
+    with transaction.atomic():
+        notification.transition_target = 'new'
+        notification.save()
+        assert Notification.objects.get_for_transition('payment_confirmed') == [notification]
+    assert Notification.objects.get_for_transition('payment_confirmed') == []
+    transition_change_notification(order)
+    assert QueuedNotification.objects.count() == 1
+
+    notification.delete()
+    assert Notification.objects.get_for_transition('new') == []
+
+
+@pytest.mark.django_db
+def test_indexed_recipient(order, user_factory, notification_factory):
+    staff = user_factory(email='staff@example.com', is_staff=True)
+    notification_factory(transition_target='new', notify=Notify.RECIPIENT, recipient=staff)
+    transition_change_notification(order)
+
+    # the index does not keep the previous email address of a recipient
+    staff.email = 'sales@example.com'
+    staff.save()
+    transition_change_notification(order)
+    assert [email.to[0] for email in Email.objects.order_by('pk')] == ['staff@example.com', 'sales@example.com']
+
+
+@pytest.mark.django_db(transaction=True)
+def test_shared_attachment(settings, tmp_path, order, notification_factory):
+    settings.MEDIA_ROOT = str(tmp_path)
+    terms = FilerFile.objects.create(file=ContentFile(b'Terms', name='terms.txt'), original_filename='terms.txt')
+    notification = notification_factory(transition_target='new', notify=Notify.CUSTOMER)
+    NotificationAttachment.objects.create(notification=notification, attachment=terms)
+    for _ in range(2):
+        transition_change_notification(order)
+
+    # the file is copied once, and referenced by each email
+    attachment = Attachment.objects.get()
+    assert attachment.name == 'terms.txt'
+    assert attachment.file.read() == b'Terms'
+    assert [list(email.attachments.all()) for email in Email.objects.all()] == [[attachment], [attachment]]
+
+    # after replacing the file, it is copied again
+    terms.file = ContentFile(b'New terms', name='terms.txt')
+    terms.save()
+    transition_change_notification(order)
+    assert Attachment.objects.count() == 2
+    assert Email.objects.latest('id').attachments.get().file.read() == b'New terms'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_immediate_shared_attachment(settings, tmp_path, mailoutbox, order, notification_factory):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.POST_OFFICE = dict(settings.POST_OFFICE, DEFAULT_PRIORITY='now')
+    terms = FilerFile.objects.create(file=ContentFile(b'Terms', name='terms.txt'), original_filename='terms.txt')
+    notification = notification_factory(transition_target='new', notify=Notify.CUSTOMER)
+    NotificationAttachment.objects.create(notification=notification, attachment=terms)
+    transition_change_notification(order)
+
+    # an email sent immediately, is sent together with its attachments
+    assert Email.objects.get().status == STATUS.sent
+    assert [attachment[:2] for attachment in mailoutbox[0].attachments] == [('terms.txt', 'Terms')]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_purged_shared_attachment(settings, tmp_path, order, notification_factory):
+    settings.MEDIA_ROOT = str(tmp_path)
+    terms = FilerFile.objects.create(file=ContentFile(b'Terms', name='terms.txt'), original_filename='terms.txt')
+    notification = notification_factory(transition_target='new', notify=Notify.CUSTOMER)
+    NotificationAttachment.objects.create(notification=notification, attachment=terms)
+    transition_change_notification(order)
+
+    # emulate the Post-Office's cleanup, deleting old emails and their orphaned attachments
+    Email.objects.all().delete()
+    Attachment.objects.all().delete()
+    transition_change_notification(order)
+    attachment = Attachment.objects.get()
+    assert list(Email.objects.get().attachments.all()) == [attachment]
@@ -1,16 +1,27 @@
+import json
+from decimal import Decimal
+from io import StringIO
+
 import pytest
 from bs4 import BeautifulSoup
 from django.core.mail import EmailMessage
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.dateparse import parse_datetime
+from django.utils import timezone
 from django.utils.timezone import datetime
 from post_office.models import Email
-from shop.models.cart import CartItemModel
-from shop.models.order import OrderModel, OrderItemModel
+from shop.admin.order import EstimatedCountPaginator
+from shop.models.cart import CartModel, CartItemModel
+from shop.models.rollup import DailyProductSales, DailyRevenue, OrderStatusCount
+from shop.models.order import ArchivedOrder, OrderModel, OrderItemModel, OrderPayment as OrderPaymentModel
 from shop.models.delivery import DeliveryModel, DeliveryItemModel
 from shop.models.notification import Notify
+from shop.views.cart import CartViewSet
 from shop.views.checkout import CheckoutViewSet
-from shop.views.order import OrderView
+from shop.views.order import OrderView, OrderCursorPagination
 
 
 @pytest.fixture(name='order')
@@ -76,6 +87,64 @@ def test_purchase(api_rf, empty_cart, commodity_factory, notification_factory):
     return order
 
 
+@pytest.mark.django_db
+def test_purchase_after_price_change(settings, api_rf, empty_cart, commodity_factory):
+    settings.SHOP_CACHE_DURATIONS = {'computed_cart': 600}
+    product = commodity_factory(unit_price='10')
+    CartItemModel.objects.create(cart=empty_cart, product=product, product_code=product.product_code, quantity=1)
+
+    # viewing the cart caches its computation
+    request = api_rf.get('/shop/api/cart')
+    request.customer = empty_cart.customer
+    assert CartViewSet.as_view({'get': 'list'})(request).status_code == 200
+    type(product).objects.filter(pk=product.pk).update(unit_price=Decimal('99'))
+
+    data = {
+        'payment_method': {'payment_modifier': 'forward-fund-payment', 'plugin_order': 1},
+        'shipping_method': {'shipping_modifier': 'self-collection', 'plugin_order': 2},
+    }
+    request = api_rf.put('/shop/api/checkout/upload', data=data, format='json')
+    request.user = empty_cart.customer.user
+    request.customer = empty_cart.customer
+    assert CheckoutViewSet.as_view({'put': 'upload'})(request).status_code == 200
+    request = api_rf.post('/shop/api/checkout/purchase')
+    request.user = empty_cart.customer.user
+    request.customer = empty_cart.customer
+    assert CheckoutViewSet.as_view({'post': 'purchase'})(request).status_code == 200
+
+    # the order is populated with the current price, rather than with the cached one
+    order = request.customer.orders.get()
+    assert order.items.get()._unit_price == Decimal('99')
+    assert order.subtotal.as_decimal() == Decimal('99')
+
+
+@pytest.mark.django_db
+def test_populate_from_cart(rf, empty_cart, commodity_factory):
+    for quantity in (1, 2, 3, 0):
+        CartItemModel.objects.create(cart=empty_cart, product=commodity_factory(), quantity=quantity)
+    request = rf.post('/shop/api/checkout/purchase')
+    request.customer = empty_cart.customer
+    order = OrderModel.objects.create_from_cart(empty_cart, request)
+    unit_prices = {item.product_id: item.unit_price for item in empty_cart._cached_cart_items}
+
+    with CaptureQueriesContext(connection) as queries:
+        order.populate_from_cart(empty_cart, request)
+    statements = [q['sql'].split(' ')[0] + ' ' + q['sql'].split(' ')[2] for q in queries
+                  if q['sql'].startswith(('INSERT', 'DELETE'))]
+    tables = ['"{}"'.format(OrderItemModel._meta.db_table), '"{}"'.format(CartItemModel._meta.db_table)]
+    assert [statement for statement in statements if statement.split(' ')[1] in tables] == [
+        'INSERT "{}"'.format(OrderItemModel._meta.db_table),
+        'DELETE "{}"'.format(CartItemModel._meta.db_table),
+    ]
+    order_items = order.items.all()
+    assert [item.quantity for item in order_items] == [1, 2, 3]
+    assert all(item.unit_price == unit_prices[item.product_id] for item in order_items)
+    assert order.subtotal == empty_cart.subtotal
+    empty_cart.refresh_from_db()
+    assert empty_cart.num_items == 0
+    assert empty_cart.items.count() == 1  # the watched item remains
+
+
 @pytest.mark.django_db
 def test_addendum(api_rf, order):
     data = {'annotation': "client comment"}
@@ -90,6 +159,37 @@ def test_addendum(api_rf, order):
     assert addendum[0][1] == "client comment"
 
 
+@pytest.mark.django_db
+def test_order_list_cursor_pagination(settings, monkeypatch, rf, customer_factory):
+    settings.SHOP_ORDER_PAGINATION = 'shop.views.order.OrderCursorPagination'
+    monkeypatch.setattr(OrderCursorPagination, 'page_size', 2)
+    customer = customer_factory()
+    created_at = timezone.now()
+    for _ in range(3):
+        OrderModel.objects.create(customer=customer, currency='EUR', _subtotal=Decimal(0), _total=Decimal(0),
+                                  created_at=created_at)  # same timestamps are ordered by primary key
+    orders = list(OrderModel.objects.filter(customer=customer).order_by('-pk'))
+
+    request = rf.get('/pages/order', HTTP_ACCEPT='application/json')
+    request.customer = customer
+    request.user = customer.user
+    response = OrderView.as_view()(request)
+    assert response.status_code == 200
+    assert 'count' not in response.data
+    assert [o['number'] for o in response.data['results']] == [o.get_number() for o in orders[:2]]
+
+    request = rf.get(response.data['next'], HTTP_ACCEPT='application/json')
+    request.customer = customer
+    request.user = customer.user
+    response = OrderView.as_view()(request)
+    assert [o['number'] for o in response.data['results']] == [orders[2].get_number()]
+    assert response.data['next'] is None
+
+    # a view declaring no pagination, is not paginated by the setting
+    response = OrderView.as_view(pagination_class=None)(request)
+    assert [o['number'] for o in response.data] == [o.get_number() for o in orders]
+
+
 @pytest.fixture(name='paid_order')
 @pytest.mark.django_db
 def test_add_forward_fund(admin_client, order):
@@ -135,6 +235,231 @@ def test_add_forward_fund(admin_client, order):
     return order
 
 
+@pytest.mark.django_db
+def test_amount_paid_without_aggregation(paid_order, django_assert_num_queries):
+    quantity = sum(item.quantity for item in paid_order.items.all())
+    order = OrderModel.objects.get(pk=paid_order.pk)
+    with django_assert_num_queries(0):
+        assert order.amount_paid == paid_order.amount_paid
+        assert order.amount_paid >= order.total
+        assert order.unfulfilled_quantity == quantity
+
+
+@pytest.mark.django_db
+def test_acknowledge_payment(order):
+    assert order.status == 'awaiting_payment'
+    OrderPaymentModel.objects.create(order=order, amount=order.total, transaction_id='payment-tx-id',
+                                     payment_method='forward-fund-payment')
+    assert order.is_fully_paid() is True
+    order.acknowledge_payment()
+    assert order.status == 'payment_confirmed'
+
+
+@pytest.mark.django_db
+def test_update_summaries(paid_order):
+    quantity = sum(item.quantity for item in paid_order.items.all())
+
+    # saving the order does not overwrite its summaries
+    paid_order._unfulfilled_quantity = 0
+    paid_order.save()
+    paid_order.refresh_from_db(fields=paid_order.summary_fields)
+    assert paid_order.unfulfilled_quantity == quantity
+
+    payment = OrderPaymentModel.objects.filter(order=paid_order).first()
+    payment.delete()
+    paid_order.refresh_from_db(fields=paid_order.summary_fields)
+    assert paid_order.amount_paid == paid_order.total - payment.amount
+
+    # summaries gone astray are repaired
+    OrderModel.objects.filter(pk=paid_order.pk).update(_amount_paid=0, _unfulfilled_quantity=0)
+    assert OrderModel.objects.update_summaries(pk=paid_order.pk) == 1
+    paid_order.refresh_from_db(fields=paid_order.summary_fields)
+    assert paid_order.amount_paid == paid_order.total - payment.amount
+    assert paid_order.unfulfilled_quantity == quantity
+
+
+@pytest.mark.django_db
+def test_update_summaries_with_deliveries(paid_order):
+    order_items = list(paid_order.items.order_by('id'))
+    quantity = sum(item.quantity for item in order_items)
+    delivery = DeliveryModel.objects.create(order=paid_order, shipping_method='testing')
+    # the delivery item's id must not accidentally coincide with the order's id
+    delivery_item = DeliveryItemModel.objects.create(pk=paid_order.pk + 1000, delivery=delivery,
+                                                     item=order_items[-1], quantity=1)
+    assert delivery_item.pk != paid_order.pk
+    paid_order.refresh_from_db(fields=paid_order.summary_fields)
+    assert paid_order.unfulfilled_quantity == quantity - 1
+
+    OrderModel.objects.filter(pk=paid_order.pk).update(_unfulfilled_quantity=0)
+    OrderModel.objects.update_summaries(pk=paid_order.pk)
+    paid_order.refresh_from_db(fields=paid_order.summary_fields)
+    assert paid_order.unfulfilled_quantity == quantity - 1
+
+
+@pytest.mark.django_db
+def test_order_detail_queries(api_rf, paid_order):
+    request = api_rf.get('/pages/order')
+    request.customer = paid_order.customer
+    with CaptureQueriesContext(connection) as queries:
+        response = OrderView.as_view(many=False)(request, slug=paid_order.get_number(), secret=paid_order.secret)
+    assert response.status_code == 200
+    assert response.data['amount_paid'] == str(paid_order.amount_paid)
+    assert len(response.data['items']) == 2
+    payment_table = OrderPaymentModel._meta.db_table
+    assert not [q for q in queries if q['sql'].startswith('SELECT SUM') and payment_table in q['sql']]
+
+
+@pytest.mark.django_db
+def test_order_changelist_queries(monkeypatch, admin_client, paid_order, customer_factory):
+    url = reverse('admin:testshop_order_changelist')
+    with CaptureQueriesContext(connection) as queries:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    assert paid_order.customer.get_username() in response.content.decode()
+
+    # the customer's username is rendered through its overridable method
+    customer_class = type(paid_order.customer)
+    monkeypatch.setattr(customer_class, 'get_username', lambda customer: "Customer #{}".format(customer.pk))
+    response = admin_client.get(url)
+    assert "Customer #{}".format(paid_order.customer.pk) in response.content.decode()
+
+    # more orders of other customers do not cause more queries
+    for _ in range(3):
+        OrderModel.objects.create(customer=customer_factory(), currency='EUR', _subtotal=Decimal(0),
+                                  _total=Decimal(0))
+    with CaptureQueriesContext(connection) as more_queries:
+        response = admin_client.get(url)
+    assert response.status_code == 200
+    assert len(more_queries) == len(queries)
+
+    # SQLite keeps no table statistics, hence the orders are counted
+    paginator = EstimatedCountPaginator(OrderModel.objects.order_by('pk'), 100)
+    assert paginator.count == 4
+
+
+@pytest.mark.django_db
+def test_export_orders(paid_order, customer_factory):
+    OrderModel.objects.create(customer=customer_factory(), currency='EUR', _subtotal=Decimal(0), _total=Decimal(0))
+    status = OrderModel.objects.values_list('status', flat=True).get(pk=paid_order.pk)
+    stdout = StringIO()
+    call_command('shop', 'export-orders', '--status', status, '--chunk-size', '1', stdout=stdout)
+    lines = stdout.getvalue().splitlines()
+    assert len(lines) == 1
+    data = json.loads(lines[0])
+    assert data['number'] == paid_order.get_number()
+    assert data['amount_paid'] == '{:f}'.format(paid_order.amount_paid)
+    assert data['customer']['email'] == paid_order.customer.email
+    assert [item['quantity'] for item in data['items']] == [1, 3]
+    assert len(data['payments']) == 2
+    assert 'rows' in data['extra']
+
+    stdout = StringIO()
+    call_command('shop', 'export-orders', '--format', 'csv', '--since', timezone.now().date().isoformat(),
+                 '--chunk-size', '1', stdout=stdout)
+    lines = stdout.getvalue().splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith('number,')
+
+
+@pytest.mark.django_db
+def test_archive_orders(api_rf, paid_order):
+    OrderModel.objects.filter(pk=paid_order.pk).update(status='ready_for_delivery')
+    before = (timezone.now() + timezone.timedelta(days=1)).date().isoformat()
+    stdout = StringIO()
+    call_command('shop', 'archive-orders', '--before', before, stdout=stdout)
+    assert stdout.getvalue().strip() == "Archived 1 orders."
+    assert not OrderModel.objects.filter(pk=paid_order.pk).exists()
+    assert not OrderItemModel.objects.filter(order_id=paid_order.pk).exists()
+    assert not OrderPaymentModel.objects.filter(order_id=paid_order.pk).exists()
+
+    # the detail view rehydrates the archived order
+    request = api_rf.get('/pages/order')
+    request.customer = paid_order.customer
+    response = OrderView.as_view(many=False)(request, slug=paid_order.get_number(), secret=paid_order.secret)
+    assert response.status_code == 200
+    assert response.data['number'] == paid_order.get_number()
+    assert response.data['amount_paid'] == str(paid_order.amount_paid)
+    assert [item['quantity'] for item in response.data['items']] == [1, 3]
+
+    # its items can be re-added to the cart
+    order = ArchivedOrder.objects.get(number=paid_order.get_number()).rehydrate()
+    cart = CartModel.objects.get(customer=paid_order.customer)
+    assert cart.num_items == 0
+    order.readd_to_cart(cart)
+    assert CartItemModel.objects.filter(cart=cart).count() == 2
+
+    # saving a rehydrated order restores it
+    order.save()
+    assert not ArchivedOrder.objects.exists()
+    assert OrderItemModel.objects.filter(order_id=paid_order.pk).count() == 2
+    assert OrderPaymentModel.objects.filter(order_id=paid_order.pk).count() == 2
+    assert OrderModel.objects.get(pk=paid_order.pk).amount_paid == paid_order.amount_paid
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sales_rollups(paid_order):
+    def rollups():
+        return (
+            list(DailyRevenue.objects.values_list('currency', 'num_orders', 'total')),
+            sorted(DailyProductSales.objects.values_list('product_code', 'quantity')),
+            dict(OrderStatusCount.objects.filter(count__gt=0).values_list('status', 'count')),
+        )
+
+    order = OrderModel.objects.get(pk=paid_order.pk)
+    revenues, sales, counts = rollups()
+    assert revenues == [('EUR', 1, order._total)]
+    assert [quantity for _, quantity in sales] == [1, 3]
+    assert counts == {order.status: 1}
+
+    # the rollups are maintained by transitions and can be rebuilt
+    with transaction.atomic():
+        order.prepayment_deposited()
+        order.save()
+        # the rollup rows are not locked until the end of the transaction
+        assert rollups()[2] == counts
+    assert order.status != 'awaiting_payment'
+    assert rollups()[2] == {order.status: 1}
+    DailyRevenue.objects.update(num_orders=0)
+    call_command('shop', 'rebuild-rollups', stdout=StringIO())
+    assert rollups() == (revenues, sales, {order.status: 1})
+
+    # saving an order with a deferred status does not count it twice
+    deferred_order = OrderModel.objects.defer('status').get(pk=order.pk)
+    deferred_order.save()
+    assert rollups()[2] == {order.status: 1}
+
+    # archived orders are kept in the rollups, if the days they were placed on are rebuilt
+    ArchivedOrder.objects.archive(order)
+    call_command('shop', 'rebuild-rollups', stdout=StringIO())
+    assert rollups() == (revenues, sales, {})
+    OrderModel.objects.create(customer=order.customer, status=order.status, currency='EUR',
+                              _subtotal=Decimal('10'), _total=Decimal('10'))
+    call_command('shop', 'rebuild-rollups', stdout=StringIO())
+    assert rollups() == ([('EUR', 2, order._total + 10)], sales, {order.status: 1})
+
+
+@pytest.mark.django_db(transaction=True)
+def test_sales_rollups_of_new_order(rf, empty_cart, commodity_factory):
+    def revenues():
+        return list(DailyRevenue.objects.values_list('num_orders', 'total'))
+
+    CartItemModel.objects.create(cart=empty_cart, product=commodity_factory(), quantity=2)
+    request = rf.post('/shop/api/checkout/purchase')
+    request.customer = empty_cart.customer
+    order = OrderModel.objects.create_from_cart(empty_cart, request)
+    order.populate_from_cart(empty_cart, request)
+
+    # an order still stored in status ``new`` is neither counted incrementally nor by rebuilding
+    assert revenues() == []
+    call_command('shop', 'rebuild-rollups', stdout=StringIO())
+    assert revenues() == []
+
+    order.save()
+    assert revenues() == [(1, order._total)]
+    call_command('shop', 'rebuild-rollups', stdout=StringIO())
+    assert revenues() == [(1, order._total)]
+
+
 @pytest.mark.django_db
 def test_fulfill_order_partially(admin_client, paid_order):
     assert paid_order.status == 'prepayment_deposited'
@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+from shop.models.defaults.customer import Customer
+from shop.models.order import OrderModel
+from shop.models.sequence import Sequence, SequenceAllocator
+
+
+@pytest.mark.django_db
+def test_allocate():
+    assert Sequence.objects.allocate('test', initial=lambda: 41) == 42
+    assert Sequence.objects.allocate('test', count=10) == 43
+    assert Sequence.objects.allocate('test') == 53
+    assert Sequence.objects.get(name='test').value == 53
+
+
+@pytest.mark.django_db(transaction=True)
+def test_allocate_in_blocks(django_assert_num_queries):
+    allocator = SequenceAllocator('test', block_size=3)
+    assert [allocator.next_value() for _ in range(3)] == [1, 2, 3]
+    assert allocator.next_value() == 4
+    assert Sequence.objects.get(name='test').value == 6
+
+    # another process starts after the allocated block
+    assert Sequence.objects.allocate('test') == 7
+    with django_assert_num_queries(0):
+        assert [allocator.next_value(), allocator.next_value()] == [5, 6]
+    assert allocator.next_value() == 8
+
+
+@pytest.mark.django_db
+def test_order_number(customer_factory):
+    year = timezone.now().year
+    customer = customer_factory()
+    order = OrderModel.objects.create(customer=customer, currency='EUR', _subtotal=Decimal(0), _total=Decimal(0),
+                                      number=int('{}00041'.format(year)))
+    assert order.get_number() == '{}-00041'.format(year)
+
+    # the sequence continues with the orders numbered so far
+    numbers = []
+    for _ in range(2):
+        order = OrderModel(customer=customer, currency='EUR', _subtotal=Decimal(0), _total=Decimal(0))
+        numbers.append(order.get_or_assign_number())
+        order.save()
+    assert numbers == ['{}-00042'.format(year), '{}-00043'.format(year)]
+
+
+@pytest.mark.django_db
+def test_customer_number(customer_factory):
+    customer = customer_factory()
+    Customer.objects.filter(pk=customer.pk).update(number=41)
+    Sequence.objects.filter(name='customer_number').delete()
+
+    customers = [customer_factory(), customer_factory()]
+    assert [c.get_or_assign_number() for c in customers] == [42, 43]
+    assert customers[0].get_or_assign_number() == 42
+    assert Customer.objects.get(pk=customers[1].pk).number == 43